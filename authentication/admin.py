@@ -1,3 +1,30 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.http import urlsafe_base64_encode
+from django.utils.encoding import force_bytes
+from .tasks import send_password_reset_emails
+
+User = get_user_model()
 
 # Register your models here.
+
+@admin.action(description="Send password reset email to selected users")
+def send_password_reset(modeladmin, request, queryset):
+    users = queryset.exclude(email='')
+    items = [
+        (user.pk, urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user))
+        for user in users
+    ]
+    # Emails go out in chunks, each chunk over a single SMTP connection
+    send_password_reset_emails(items)
+    modeladmin.message_user(request, f"Queued password reset emails for {len(items)} user(s).", messages.SUCCESS)
+
+
+class OpusToolsUserAdmin(UserAdmin):
+    actions = [send_password_reset]
+
+
+admin.site.unregister(User)
+admin.site.register(User, OpusToolsUserAdmin)
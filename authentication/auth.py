@@ -0,0 +1,89 @@
+# authentication/auth.py
+
+import hashlib
+
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+# How long (in seconds) a resolved token stays in the cache before it is looked up again
+TOKEN_CACHE_TIMEOUT = 60
+
+
+def token_cache_key(key):
+    """
+    Builds the cache key for a DRF token. The raw token is hashed so it never
+    ends up in the cache backend in plain text.
+    """
+    return "tok:" + hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def jwt_cache_key(jti):
+    """
+    Builds the cache key for the user behind an access token, keyed on its jti claim.
+    """
+    return "jwt:" + jti
+
+
+def invalidate_cached_token(key):
+    """
+    Drops a token from the cache, e.g. on logout or when the user's details change.
+    """
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_cached_auth(auth):
+    """
+    Drops the cached user behind request.auth, whether it's a DRF Token or a validated JWT.
+    """
+    if isinstance(auth, Token):
+        invalidate_cached_token(auth.key)
+    elif auth is not None and jwt_settings.JTI_CLAIM in auth:
+        cache.delete(jwt_cache_key(auth[jwt_settings.JTI_CLAIM]))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that memoizes the (user, token) pair in Django's cache,
+    so authenticated requests skip the authtoken_token and auth_user SELECTs.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+
+        if cached is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise AuthenticationFailed('Invalid token.')
+            cached = (token.user, token)
+            cache.set(cache_key, cached, TOKEN_CACHE_TIMEOUT)
+
+        user, token = cached
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+
+        return (user, token)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that caches the user per access token (keyed on jti), so a
+    valid token costs one signature check and no auth_user SELECT.
+    """
+
+    def get_user(self, validated_token):
+        cache_key = jwt_cache_key(validated_token[jwt_settings.JTI_CLAIM])
+        user = cache.get(cache_key)
+
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(cache_key, user, TOKEN_CACHE_TIMEOUT)
+        elif not user.is_active:
+            raise AuthenticationFailed('User is inactive.')
+
+        return user
@@ -0,0 +1,32 @@
+# authentication/backends.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+User = get_user_model()
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Authenticates against either the username or the email address with a single query.
+    """
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        if username is None and email is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if password is None or (username is None and email is None):
+            return None
+
+        if email is not None:
+            user = User._default_manager.filter(email__iexact=email).order_by('pk').first()
+        else:
+            user = User._default_manager.filter(**{User.USERNAME_FIELD: username}).first()
+
+        if user is None:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user (#20760).
+            User().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
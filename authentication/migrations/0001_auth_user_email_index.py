@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        # Functional index matching the UPPER(email) = UPPER(%s) lookup Django emits for email__iexact
+        migrations.RunSQL(
+            sql="CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_email_upper_idx ON auth_user (UPPER(email));",
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS auth_user_email_upper_idx;",
+        ),
+    ]
@@ -14,10 +14,12 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         # We're handling email, first_name, last_name updates here.
         # Username is set to read_only_fields.
-        instance.email = validated_data.get('email', instance.email)
-        instance.first_name = validated_data.get('first_name', instance.first_name)
-        instance.last_name = validated_data.get('last_name', instance.last_name)
-        instance.save()
+        changed = [f for f in ('email', 'first_name', 'last_name') if validated_data.get(f) is not None]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        # Only write the columns that were sent, rather than every column on auth_user
+        if changed:
+            instance.save(update_fields=changed)
         return instance
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -61,14 +63,10 @@ class LoginSerializer(serializers.Serializer):
 
         if username:
             user = authenticate(request=self.context.get('request'), username=username, password=password)
-        elif email:
-            # Authenticate by email
-            try:
-                user_obj = User.objects.get(email=email)
-                user = authenticate(request=self.context.get('request'), username=user_obj.username, password=password)
-            except User.DoesNotExist:
-                user = None # User with this email doesn't exist
-            
+        else:
+            # Authenticate by email (EmailOrUsernameBackend resolves it in one query)
+            user = authenticate(request=self.context.get('request'), email=email, password=password)
+
         if not user:
             msg = 'Unable to log in with provided credentials.'
             raise serializers.ValidationError(msg, code='authorization')
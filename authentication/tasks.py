@@ -1,39 +1,65 @@
 # opustools/authentication/tasks.py
 
-from celery import shared_task
-from django.core.mail import send_mail
+from celery import shared_task, group
+from django.core import mail
 from django.contrib.auth import get_user_model
 from django.conf import settings
 
 User = get_user_model()
 
+# Number of reset emails sent over a single SMTP connection
+PASSWORD_RESET_EMAIL_CHUNK_SIZE = 50
+
+_RESET_URL_FMT = "https://opustools.xyz/password/reset/confirm/{uid}/{token}/" # Your frontend domain
+_RESET_SUBJECT = 'Reset Your Password for OpusTools'
+_RESET_BODY = (
+    "Hello {username},\n\n"
+    "You are receiving this email because you requested a password reset for your account at OpusTools.\n\n"
+    "Please go to the following page and choose a new password:\n"
+    "{reset_url}\n\n"
+    "If you did not request a password reset, please ignore this email.\n\n"
+    "Thanks,\nThe OpusTools Team"
+)
+
 @shared_task
 def send_password_reset_email(user_id, uid, token):
     """
     A Celery task to send a password reset email asynchronously.
     """
-    try:
-        user = User.objects.get(pk=user_id)
-        frontend_url = 'https://opustools.xyz' # Your frontend domain
-        reset_url = f"{frontend_url}/password/reset/confirm/{uid}/{token}/"
-
-        subject = 'Reset Your Password for OpusTools'
-        message = (
-            f"Hello {user.username},\n\n"
-            f"You are receiving this email because you requested a password reset for your account at OpusTools.\n\n"
-            f"Please go to the following page and choose a new password:\n"
-            f"{reset_url}\n\n"
-            f"If you did not request a password reset, please ignore this email.\n\n"
-            f"Thanks,\nThe OpusTools Team"
-        )
-
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
-    except User.DoesNotExist:
-        # Handle case where user might be deleted before task runs
-        pass
\ No newline at end of file
+    send_password_reset_emails_chunk([(user_id, uid, token)])
+
+@shared_task
+def send_password_reset_emails_chunk(items):
+    """
+    Sends password reset emails for a list of (user_id, uid, token) items,
+    reusing one SMTP connection for the whole chunk.
+    """
+    users = User.objects.filter(pk__in=[user_id for user_id, _, _ in items]).only('username', 'email').in_bulk()
+    if not users:
+        # Handle case where users might be deleted before task runs
+        return
+
+    with mail.get_connection() as connection:
+        for user_id, uid, token in items:
+            user = users.get(user_id)
+            if user is None:
+                continue
+
+            reset_url = _RESET_URL_FMT.format(uid=uid, token=token)
+            message = _RESET_BODY.format_map({'username': user.username, 'reset_url': reset_url})
+
+            mail.EmailMessage(
+                _RESET_SUBJECT,
+                message,
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email],
+                connection=connection,
+            ).send(fail_silently=False)
+
+def send_password_reset_emails(items, chunk_size=PASSWORD_RESET_EMAIL_CHUNK_SIZE):
+    """
+    Dispatches password reset emails for many users at once, one task per chunk.
+    """
+    items = list(items)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    return group(send_password_reset_emails_chunk.s(chunk) for chunk in chunks).apply_async()
@@ -1,12 +1,14 @@
 # authentication/urls.py
 
 from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView
 from .views import RegisterView, LoginView, LogoutView, UserDetailUpdateView, GetCSRFToken, PasswordResetRequestView, PasswordResetConfirmView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('user/', UserDetailUpdateView.as_view(), name='user-detail-update'),
     path('csrf/', GetCSRFToken.as_view(), name='csrf-token'),
     
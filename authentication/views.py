@@ -1,21 +1,40 @@
 # authentication/views.py
 
+import hashlib
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import login, logout, get_user_model
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
 from django.middleware.csrf import get_token
 
 from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode, parse_etags
 from django.utils.encoding import force_bytes, force_str
 from .tasks import send_password_reset_email
 from .serializers import PasswordResetRequestSerializer, PasswordResetConfirmSerializer
+from .auth import invalidate_cached_token, invalidate_cached_auth
+from opustools_project.utils import get_client_ip, incr_expiring_counter
 
 User = get_user_model() # Get the currently active user model
 
+def _issue_tokens(user):
+    """
+    Issues a JWT access/refresh pair. Requests authenticated with it are verified
+    by signature alone, so there's no per-request token lookup.
+    """
+    refresh = RefreshToken.for_user(user)
+    return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
+# Password reset requests allowed per client IP per minute
+PASSWORD_RESET_RATE_LIMIT = 5
+
+# Stand-in checked against when the uid doesn't resolve, so both branches pay for the token HMAC
+_DUMMY_USER = User(pk=0, password='!')
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
@@ -25,10 +44,9 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
         return Response({
             "user": UserSerializer(user, context=self.get_serializer_context()).data,
-            "token": token.key,
+            **_issue_tokens(user),
             "message": "User registered successfully."
         }, status=status.HTTP_201_CREATED)
 
@@ -41,21 +59,33 @@ class LoginView(APIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         login(request, user) # This sets the session cookie (optional, for session auth)
-        token, created = Token.objects.get_or_create(user=user)
 
-        response = Response({
+        # login() rotates the CSRF token, so CsrfViewMiddleware sets the new cookie on this response
+        return Response({
             "user": UserSerializer(user).data, # Use the updated UserSerializer
-            "token": token.key,
+            **_issue_tokens(user),
             "message": "Logged in successfully."
         })
-        response.set_cookie('csrftoken', get_token(request))
-        return response
 
 class LogoutView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request, format=None):
-        request.user.auth_token.delete() # Delete the user's token
+        # Revoke the refresh token so no new access tokens can be minted from it
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                RefreshToken(refresh).blacklist()
+            except TokenError:
+                pass # Already expired or blacklisted
+        invalidate_cached_auth(request.auth)
+
+        # Delete any legacy DRF token, dropping its cached lookup first
+        legacy_token = Token.objects.filter(user=request.user).first()
+        if legacy_token:
+            invalidate_cached_token(legacy_token.key)
+            legacy_token.delete()
+
         logout(request) # Clear session (if using session auth)
         response = Response({"message": "Successfully logged out."}, status=status.HTTP_200_OK)
         response.delete_cookie('csrftoken') # Clear CSRF cookie on logout
@@ -66,10 +96,18 @@ class LogoutView(APIView):
 class UserDetailUpdateView(generics.RetrieveUpdateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserSerializer # This serializer will be used for both retrieve and update
+    # Only the serialized columns; get_object() below never hits it, but keeps DRF introspection narrow
+    queryset = User.objects.only('id', 'username', 'email', 'first_name', 'last_name')
 
     def get_object(self):
+        # The authenticated user is already loaded (and cached) by the auth class, so no re-fetch
         return self.request.user
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # The authenticated user is cached alongside the token, so refresh it after an update
+        invalidate_cached_auth(self.request.auth)
+
     # You can add custom logic for partial updates if needed, but serializer handles most
     def partial_update(self, request, *args, **kwargs):
         # Allow username and email to be updated, and also first_name/last_name
@@ -81,12 +119,29 @@ class UserDetailUpdateView(generics.RetrieveUpdateAPIView):
         return Response(serializer.data)
 
 
+def _csrf_etag(secret):
+    """
+    ETag for the CSRF endpoint, derived from (but not revealing) the CSRF secret.
+    """
+    return '"%s"' % hashlib.sha256(secret.encode()).hexdigest()[:32]
+
 class GetCSRFToken(APIView):
     permission_classes = (permissions.AllowAny,)
 
     def get(self, request, format=None):
-        csrf_token = get_token(request)
-        return Response({'csrfToken': csrf_token}, status=status.HTTP_200_OK)
+        # CsrfViewMiddleware puts the secret from an incoming cookie in CSRF_COOKIE. Any masked
+        # token derived from it stays valid, so a client already holding one can reuse its copy.
+        secret = request.META.get('CSRF_COOKIE')
+        if secret and _csrf_etag(secret) in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            csrf_token = get_token(request)
+            response = Response({'csrfToken': csrf_token}, status=status.HTTP_200_OK)
+            secret = request.META['CSRF_COOKIE']
+
+        response['ETag'] = _csrf_etag(secret)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
     
 
 class PasswordResetRequestView(generics.GenericAPIView):
@@ -97,8 +152,21 @@ class PasswordResetRequestView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data['email']
+
+        # Always return a success message to prevent user enumeration
+        response = Response(
+            {"detail": "If an account with this email exists, a password reset link has been sent."},
+            status=status.HTTP_200_OK
+        )
+
+        # Past the per-IP limit, answer without touching the database
+        bucket = f"pwreset:{get_client_ip(request)}"
+        if incr_expiring_counter(bucket, 60) > PASSWORD_RESET_RATE_LIMIT:
+            return response
+
+        # Only the columns make_token() hashes; email__iexact uses the UPPER(email) index
         User = get_user_model()
-        user = User.objects.filter(email=email).first()
+        user = User.objects.filter(email__iexact=email).only('id', 'password', 'last_login', 'email').first()
 
         if user:
             # Generate token and UID
@@ -108,11 +176,7 @@ class PasswordResetRequestView(generics.GenericAPIView):
             # Dispatch email sending to Celery
             send_password_reset_email.delay(user.id, uid, token)
 
-        # Always return a success message to prevent user enumeration
-        return Response(
-            {"detail": "If an account with this email exists, a password reset link has been sent."},
-            status=status.HTTP_200_OK
-        )
+        return response
 
 class PasswordResetConfirmView(generics.GenericAPIView):
     permission_classes = [permissions.AllowAny]
@@ -129,9 +193,12 @@ class PasswordResetConfirmView(generics.GenericAPIView):
         except (TypeError, ValueError, OverflowError, get_user_model().DoesNotExist):
             user = None
 
-        if user is not None and default_token_generator.check_token(user, data['token']):
+        # Always run the token check so response time doesn't reveal whether the uid exists
+        is_valid = default_token_generator.check_token(user or _DUMMY_USER, data['token'])
+
+        if user is not None and is_valid:
             user.set_password(data['new_password'])
-            user.save()
+            user.save(update_fields=['password'])
             return Response({"detail": "Password has been reset successfully."}, status=status.HTTP_200_OK)
         else:
             return Response({"detail": "Invalid token or user ID."}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
@@ -30,8 +30,22 @@ class PostSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
 
-    def get_cover_image(self, obj):
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Prefetches the relations this serializer renders, so a page of posts
+        costs a fixed number of queries instead of one tag query per post.
+        """
+        return queryset.prefetch_related('tags')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Build the scheme://host prefix once instead of per post in list responses
         request = self.context.get('request')
-        if obj.cover_image and hasattr(obj.cover_image, 'url'):
-            return request.build_absolute_uri(obj.cover_image.url)
+        self._base_url = (request.scheme + '://' + request.get_host()) if request else ''
+
+    def get_cover_image(self, obj):
+        # FieldFile.url only raises when there's no file name, so check that directly
+        if obj.cover_image and obj.cover_image.name:
+            return self._base_url + obj.cover_image.url
         return None
\ No newline at end of file
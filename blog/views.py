@@ -4,7 +4,7 @@ from .models import Post, Category, Tag
 from .serializers import PostSerializer, CategorySerializer, TagSerializer
 
 class PostListCreateView(generics.ListCreateAPIView):
-    queryset = Post.objects.filter(status="published")
+    queryset = PostSerializer.setup_eager_loading(Post.objects.filter(status="published"))
     serializer_class = PostSerializer
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['title', 'excerpt', 'content']
@@ -17,7 +17,7 @@ class PostListCreateView(generics.ListCreateAPIView):
 
 
 class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.all()
+    queryset = PostSerializer.setup_eager_loading(Post.objects.all())
     serializer_class = PostSerializer
     lookup_field = 'slug'
 
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ImageToolConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'image_tool'
+
+    def ready(self):
+        from opustools_project.utils import ensure_upload_temp_dir
+        # Large image uploads are spooled to FILE_UPLOAD_TEMP_DIR
+        ensure_upload_temp_dir()
@@ -2,11 +2,13 @@
 
 import uuid
 import os
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.functions import RandomUUID
 from django.conf import settings # Needed for MEDIA_ROOT and MEDIA_URL in delete methods
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 import logging
+from opustools_project.utils import invalidate_job_status, invalidate_job_statuses
 
 logger = logging.getLogger(__name__)
 
@@ -25,8 +27,27 @@ def image_uploaded_file_path(instance, filename):
 # and stored as a URL in output_url. The path in MEDIA_ROOT will be:
 # MEDIA_ROOT/image_tool_processed/<job_uuid>/<filename>
 
+def schedule_file_removal(paths):
+    """
+    Hands files (and their now-empty directories) to a Celery worker once the
+    surrounding transaction commits, so deletes don't block on filesystem I/O.
+    """
+    if not paths:
+        return
+    from .tasks import unlink_paths # Imported here: tasks.py imports this module
+    transaction.on_commit(lambda: unlink_paths.delay(paths))
+
 # --- Image Tool Models ---
 
+class UploadedFileQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Bulk deletes (e.g. the admin action) bypass Model.delete(), so collect all
+        file paths here and remove them in a single task.
+        """
+        schedule_file_removal([f.file.path for f in self.only('file') if f.file])
+        return super().delete()
+
 class UploadedFile(models.Model):
     """
     Represents an original image file uploaded by the user specifically for the image_tool.
@@ -36,6 +57,8 @@ class UploadedFile(models.Model):
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UploadedFileQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Image Uploaded File (Image Tool)"
         verbose_name_plural = "Image Uploaded Files (Image Tool)"
@@ -50,18 +73,22 @@ class UploadedFile(models.Model):
         Deletes the associated file from storage when the UploadedFile model instance is deleted.
         """
         if self.file:
-            try:
-                # Delete the actual file
-                self.file.delete(save=False)
-                # Try to remove the unique directory if it becomes empty
-                file_dir = os.path.dirname(self.file.path)
-                if os.path.exists(file_dir) and not os.listdir(file_dir):
-                    os.rmdir(file_dir)
-            except OSError as e:
-                logger.error(f"Error deleting uploaded image file {self.file.path}: {e}", exc_info=True)
-            except Exception as e:
-                logger.error(f"Unexpected error during uploaded image file deletion for {self.file.path}: {e}", exc_info=True)
-        super().delete(*args, **kwargs)
+            schedule_file_removal([self.file.path])
+        return super().delete(*args, **kwargs)
+
+
+class ImageConversionJobQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Bulk deletes bypass Model.delete(), so collect all processed file paths
+        here and remove them in a single task.
+        """
+        jobs = list(self.select_related('uploaded_file').only('output_url', 'output_relative_path', 'uploaded_file__file'))
+        schedule_file_removal([job.get_output_file_path() for job in jobs if job.has_own_output_file()])
+        result = super().delete()
+        # Stop the status endpoint serving the deleted jobs from cache
+        invalidate_job_statuses(ImageConversionJob.STATUS_CACHE_PREFIX, [job.pk for job in jobs])
+        return result
 
 
 class ImageConversionJob(models.Model):
@@ -85,7 +112,9 @@ class ImageConversionJob(models.Model):
         ('TIFF', 'TIFF'), # Although less common for web, support if needed
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Generated by Postgres (gen_random_uuid()) and returned by the INSERT. UploadedFile keeps its
+    # Python-side default because image_uploaded_file_path() needs the id before the row exists.
+    id = models.UUIDField(primary_key=True, db_default=RandomUUID(), editable=False)
     # Link to the specific UploadedFile for this image job
     # Note: This ForeignKey refers to the UploadedFile model within the *same* app.
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='image_conversion_jobs')
@@ -139,6 +168,11 @@ class ImageConversionJob(models.Model):
         null=True, blank=True,
         help_text="URL to the processed image file (relative to MEDIA_URL)."
     )
+    output_relative_path = models.CharField(
+        max_length=500,
+        null=True, blank=True,
+        help_text="Path of the processed image file relative to MEDIA_ROOT."
+    )
     error_message = models.TextField(
         null=True, blank=True,
         help_text="Detailed message if the job failed."
@@ -147,38 +181,62 @@ class ImageConversionJob(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ImageConversionJobQuerySet.as_manager()
+
+    # Cache key prefix for the serialized status polled by ImageConversionJobStatusView
+    STATUS_CACHE_PREFIX = 'imgjob'
+
     class Meta:
         verbose_name = "Image Conversion Job"
         verbose_name_plural = "Image Conversion Jobs"
         # Explicit table name for clarity and isolation
         db_table = 'image_tool_conversion_jobs'
         ordering = ['-created_at'] # Order by most recent jobs first
+        indexes = [
+            # A user's job list (WHERE user_id = ? ORDER BY created_at DESC) becomes an index range scan
+            models.Index(fields=['user', '-created_at'], name='ictj_user_created_idx'),
+            # Also serves plain status filters, as its leading column
+            models.Index(fields=['status', 'created_at'], name='ictj_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Image Job {self.id} | Status: {self.status} | File: {self.uploaded_file.original_filename}"
 
+    def get_output_file_path(self):
+        """
+        Absolute filesystem path of the processed file referenced by output_url.
+        """
+        return os.path.join(settings.MEDIA_ROOT, self.get_output_relative_path())
+
+    def get_output_relative_path(self):
+        """
+        Path of the processed file relative to MEDIA_ROOT.
+        """
+        if self.output_relative_path:
+            return self.output_relative_path
+        # Jobs completed before output_relative_path existed only have the URL
+        return self.output_url.replace(settings.MEDIA_URL, '', 1)
+
+    def has_own_output_file(self):
+        """
+        Whether the job has a processed file of its own to remove when it is deleted. Passthrough
+        conversions point output_url at the upload itself, which belongs to the UploadedFile row.
+        """
+        return bool(self.output_url) and self.get_output_relative_path() != self.uploaded_file.file.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Status pollers read a cached copy; make the next poll see this write
+        invalidate_job_status(self.STATUS_CACHE_PREFIX, self.pk)
+
     def delete(self, *args, **kwargs):
         """
         Deletes the associated processed file from storage when the ImageConversionJob is deleted.
         """
-        if self.output_url:
-            try:
-                # Remove MEDIA_URL prefix to get relative path within MEDIA_ROOT
-                relative_path_in_media = self.output_url.replace(settings.MEDIA_URL, '', 1)
-                full_path_to_file = os.path.join(settings.MEDIA_ROOT, relative_path_in_media)
-
-                if os.path.exists(full_path_to_file):
-                    os.remove(full_path_to_file)
-                    logger.info(f"Deleted processed file: {full_path_to_file}")
-
-                    # Attempt to remove the job-specific directory if it's empty
-                    job_specific_dir = os.path.dirname(full_path_to_file)
-                    if os.path.exists(job_specific_dir) and not os.listdir(job_specific_dir):
-                        os.rmdir(job_specific_dir)
-                        logger.info(f"Deleted empty directory: {job_specific_dir}")
-
-            except OSError as e:
-                logger.error(f"Error deleting processed image file {full_path_to_file} for job {self.id}: {e}", exc_info=True)
-            except Exception as e:
-                logger.error(f"Unexpected error during processed image file deletion for job {self.id}: {e}", exc_info=True)
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        if self.has_own_output_file():
+            schedule_file_removal([self.get_output_file_path()])
+        job_id = self.pk
+        result = super().delete(*args, **kwargs)
+        # Stop the status endpoint serving the deleted job from cache
+        invalidate_job_status(self.STATUS_CACHE_PREFIX, job_id)
+        return result
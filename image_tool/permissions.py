@@ -1,6 +1,6 @@
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied
-import datetime
+from opustools_project.utils import consume_daily_allowance, get_client_ip
 
 class HasConversionAllowance(permissions.BasePermission):
     """
@@ -16,29 +16,19 @@ class HasConversionAllowance(permissions.BasePermission):
         if request.user and request.user.is_authenticated:
             return True
 
-        # Unauthenticated users have a limit based on their session
-        session = request.session
-        today_str = datetime.date.today().isoformat()
-        
-        # Initialize or retrieve conversion count for today
-        conversion_counts = session.get('conversion_counts', {})
-        current_day_count = conversion_counts.get(today_str, 0)
+        # For GET requests (e.g., status/download), allow if the job exists/is being checked
+        # and doesn't explicitly involve creating a new conversion.
+        # This permission only restricts the *creation* of new conversion jobs.
+        if request.method != 'POST':
+            return True # Allow GET, HEAD, OPTIONS requests
+
+        # Unauthenticated users have a limit based on their session (or IP if there is none yet)
+        client_id = request.session.session_key or get_client_ip(request)
 
         # Define the limit for unauthenticated users
         UNAUTH_CONVERSION_LIMIT = 2 # Example: 2 conversions per day for unauthenticated users
 
-        if request.method == 'POST':
-            if current_day_count >= UNAUTH_CONVERSION_LIMIT:
-                # If limit exceeded for POST request, raise PermissionDenied with custom code
-                raise PermissionDenied(detail={'detail': self.message, 'code': self.code})
-            else:
-                # Increment count for successful POST
-                conversion_counts[today_str] = current_day_count + 1
-                session['conversion_counts'] = conversion_counts
-                session.modified = True # Ensure session is saved
-                return True
-        
-        # For GET requests (e.g., status/download), allow if the job exists/is being checked
-        # and doesn't explicitly involve creating a new conversion.
-        # This permission only restricts the *creation* of new conversion jobs.
-        return True # Allow GET, HEAD, OPTIONS requests
\ No newline at end of file
+        # If limit exceeded for a POST request, raise PermissionDenied with custom code
+        if not consume_daily_allowance('convcnt', client_id, UNAUTH_CONVERSION_LIMIT):
+            raise PermissionDenied(detail={'detail': self.message, 'code': self.code})
+        return True
@@ -1,9 +1,75 @@
 # image_tool/serializers.py
 
+from django.db import transaction
 from rest_framework import serializers
+from PIL import Image
 from .models import UploadedFile, ImageConversionJob
 import os
 
+
+def _sniff_format(upload):
+    """
+    Returns the PIL format name of an uploaded image, reading only its header,
+    or None if it isn't a recognisable image.
+    """
+    try:
+        with Image.open(upload) as img:
+            return img.format
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Oversized images aren't passthrough candidates; the worker reports them as before
+        return None
+    finally:
+        upload.seek(0)
+
+
+def _validate_resizer(data):
+    width = data.get('width')
+    height = data.get('height')
+
+    # For resizer, either width or height must be provided
+    if not width and not height:
+        raise serializers.ValidationError(
+            {"width": "At least one of 'width' or 'height' is required for image resizing."},
+            code='required'
+        )
+
+    # Ensure provided dimensions are valid integers
+    if width is not None and not isinstance(width, int):
+        raise serializers.ValidationError({"width": "Width must be an integer."})
+    if height is not None and not isinstance(height, int):
+        raise serializers.ValidationError({"height": "Height must be an integer."})
+
+
+def _validate_compressor(data):
+    # For compressor, quality or target_format are optional, but if quality is provided, validate it
+    quality = data.get('quality')
+    if quality is not None and (not isinstance(quality, int) or not (0 <= quality <= 100)):
+        raise serializers.ValidationError({"quality": "Quality must be an integer between 0 and 100."})
+
+
+def _validate_converter(data):
+    # For converter, target_format is required
+    target_format = data.get('target_format')
+    if not target_format:
+        raise serializers.ValidationError(
+            {"target_format": "This field is required for format conversion."},
+            code='required'
+        )
+
+    # Converting to the format the file is already in is a no-op
+    uploaded_file = data.get('uploaded_file')
+    if uploaded_file is not None:
+        data['_passthrough'] = _sniff_format(uploaded_file) == target_format.upper()
+
+
+# Per-tool_type checks run by ImageConversionJobSerializer.validate
+_VALIDATORS = {
+    'image_resizer': _validate_resizer,
+    'image_compressor': _validate_compressor,
+    'image_converter': _validate_converter,
+}
+
+
 class UploadedFileSerializer(serializers.ModelSerializer):
     """
     Serializer for the UploadedFile model. Used to represent details of the
@@ -41,18 +107,27 @@ class ImageConversionJobSerializer(serializers.ModelSerializer):
         and ImageConversionJob instances.
         """
         uploaded_file_data = validated_data.pop('uploaded_file')
+        passthrough = validated_data.pop('_passthrough', False)
         
-        # Create the UploadedFile instance first
-        uploaded_file_instance = UploadedFile.objects.create(
-            file=uploaded_file_data,
-            original_filename=uploaded_file_data.name
-        )
-        
-        # Create the ImageConversionJob instance, linking it to the new UploadedFile
-        job = ImageConversionJob.objects.create(
-            uploaded_file=uploaded_file_instance,
-            **validated_data
-        )
+        # Both rows commit together, so a worker never sees a job without its file
+        with transaction.atomic():
+            # Create the UploadedFile instance first
+            uploaded_file_instance = UploadedFile.objects.create(
+                file=uploaded_file_data,
+                original_filename=uploaded_file_data.name
+            )
+
+            # Nothing to transform: the stored upload is the result, and no task is enqueued
+            if passthrough:
+                validated_data['status'] = 'COMPLETED'
+                validated_data['output_url'] = uploaded_file_instance.file.url
+                validated_data['output_relative_path'] = uploaded_file_instance.file.name
+
+            # Create the ImageConversionJob instance, linking it to the new UploadedFile
+            job = ImageConversionJob.objects.create(
+                uploaded_file=uploaded_file_instance,
+                **validated_data
+            )
         return job
 
     def validate(self, data):
@@ -67,38 +142,11 @@ class ImageConversionJobSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"tool_type": "This field is required."})
 
         # --- Conditional Validation based on tool_type ---
-        if tool_type == 'image_resizer':
-            # For resizer, either width or height must be provided
-            if not data.get('width') and not data.get('height'):
-                raise serializers.ValidationError(
-                    {"width": "At least one of 'width' or 'height' is required for image resizing."},
-                    code='required'
-                )
-            
-            # Ensure provided dimensions are valid integers
-            if data.get('width') is not None and not isinstance(data.get('width'), int):
-                raise serializers.ValidationError({"width": "Width must be an integer."})
-            if data.get('height') is not None and not isinstance(data.get('height'), int):
-                raise serializers.ValidationError({"height": "Height must be an integer."})
-
-        elif tool_type == 'image_compressor':
-            # For compressor, quality or target_format are optional, but if quality is provided, validate it
-            if data.get('quality') is not None:
-                quality = data.get('quality')
-                if not isinstance(quality, int) or not (0 <= quality <= 100):
-                    raise serializers.ValidationError({"quality": "Quality must be an integer between 0 and 100."})
-            
-        elif tool_type == 'image_converter':
-            # For converter, target_format is required
-            if not data.get('target_format'):
-                raise serializers.ValidationError(
-                    {"target_format": "This field is required for format conversion."},
-                    code='required'
-                )
-        
-        else:
+        validator = _VALIDATORS.get(tool_type)
+        if validator is None:
             # Handle unknown tool types
             raise serializers.ValidationError({"tool_type": f"Invalid tool type: {tool_type}. "
                                                             "Choices are 'image_resizer', 'image_compressor', 'image_converter'."})
+        validator(data)
         
         return data
\ No newline at end of file
@@ -1,40 +1,42 @@
 # image_tool/tasks.py
 
 import os
+import errno
 import logging
 import datetime
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from celery import shared_task
+from celery.signals import worker_process_init, worker_process_shutdown
 from django.conf import settings
-from PIL import Image
+from django.utils import timezone
+from PIL import Image, ImageChops, ImageStat, features
+
+try:
+    import pyvips
+except (ImportError, OSError):  # pyvips missing, or installed without the libvips shared library
+    pyvips = None
+
+try:
+    from nvidia import nvimgcodec
+except ImportError:  # optional: nvidia-nvimgcodec-cu12, only useful on GPU workers
+    nvimgcodec = None
 
 # Import the model from the current app
 from .models import ImageConversionJob
+from opustools_project.utils import invalidate_job_status
 
 logger = logging.getLogger(__name__)
 
-# Helper to get PIL format from filename extension, or default
-def get_pil_format_from_filename(filename):
+
+def _flatten_rgba_to_rgb(rgba_image: Image.Image, bg=(255, 255, 255)) -> Image.Image:
     """
-    Determines the PIL format string (e.g., 'JPEG', 'PNG') from a filename's extension.
-    Returns a default if not recognized.
+    Composites an RGBA image onto a solid background. alpha_composite runs in C
+    over the whole buffer, unlike a masked paste() with a split-out alpha band.
     """
-    ext = os.path.splitext(filename)[1].lower()
-    if ext == '.jpg' or ext == '.jpeg':
-        return 'JPEG'
-    elif ext == '.png':
-        return 'PNG'
-    elif ext == '.gif':
-        return 'GIF'
-    elif ext == '.webp':
-        return 'WEBP'
-    elif ext == '.bmp':
-        return 'BMP'
-    elif ext == '.tiff' or ext == '.tif':
-        return 'TIFF'
-    # Default to a common format
-    return 'JPEG'
+    background = Image.new('RGBA', rgba_image.size, bg + (255,))
+    return Image.alpha_composite(background, rgba_image).convert('RGB')
 
 
 def convert_to_rgb_for_jpeg(image_to_convert: Image.Image) -> Image.Image:
@@ -47,20 +49,15 @@ def convert_to_rgb_for_jpeg(image_to_convert: Image.Image) -> Image.Image:
     mode = image_to_convert.mode
 
     # Handle images with explicit alpha
-    if mode in ('RGBA', 'LA'):
-        background = Image.new('RGB', image_to_convert.size, (255, 255, 255))
-        alpha = image_to_convert.split()[-1]
-        background.paste(image_to_convert, (0, 0), alpha)
-        return background
+    if mode == 'RGBA':
+        return _flatten_rgba_to_rgb(image_to_convert)
+    if mode == 'LA':
+        return _flatten_rgba_to_rgb(image_to_convert.convert('RGBA'))
 
     # Handle palette images that may carry transparency
     if mode == 'P':
         if 'transparency' in image_to_convert.info:
-            rgba = image_to_convert.convert('RGBA')
-            background = Image.new('RGB', rgba.size, (255, 255, 255))
-            alpha = rgba.split()[-1]
-            background.paste(rgba, (0, 0), alpha)
-            return background
+            return _flatten_rgba_to_rgb(image_to_convert.convert('RGBA'))
         else:
             return image_to_convert.convert('RGB')
 
@@ -71,6 +68,197 @@ def convert_to_rgb_for_jpeg(image_to_convert: Image.Image) -> Image.Image:
     return image_to_convert
 
 
+# Source images above this many pixels are resized in parallel strips by the Pillow path
+PARALLEL_RESIZE_MIN_PIXELS = 8_000_000
+
+# Threads per resize: a share of the cores left over by the worker's own process pool
+_RESIZE_THREADS = max(1, min(4, (os.cpu_count() or 1) // (getattr(settings, 'CELERY_WORKER_CONCURRENCY', None) or 1)))
+
+# Modes Pillow resamples with premultiplied alpha (see Image.resize)
+_PREMULTIPLIED_MODES = {'RGBA': 'RGBa', 'LA': 'La'}
+
+
+def _parallel_resize(img: Image.Image, size, n_threads=_RESIZE_THREADS) -> Image.Image:
+    """
+    LANCZOS-resizes img by splitting the *output* into horizontal strips and resampling each
+    one from the matching source box on its own thread (Pillow releases the GIL while resampling).
+    Each strip still reads its filter support from the full source, so there are no seams.
+    """
+    n_threads = min(n_threads, size[1])
+    if n_threads < 2 or img.mode in ('1', 'P'):
+        return img.resize(size, Image.LANCZOS)
+
+    # Do the premultiply once here rather than in every strip's resize() call
+    source = img.convert(_PREMULTIPLIED_MODES[img.mode]) if img.mode in _PREMULTIPLIED_MODES else img
+    source.load()
+
+    width, height = size
+    scale_y = source.height / height
+    bounds = [height * i // n_threads for i in range(n_threads + 1)]
+
+    def resize_strip(y0, y1):
+        return source.resize((width, y1 - y0), Image.LANCZOS, box=(0, y0 * scale_y, source.width, y1 * scale_y))
+
+    result = Image.new(source.mode, size)
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        strips = executor.map(resize_strip, bounds[:-1], bounds[1:])
+        for y0, strip in zip(bounds, strips):
+            result.paste(strip, (0, y0))
+
+    return result.convert(img.mode) if source is not img else result
+
+
+# Pillow built against libimagequant (the library behind pngquant) can quantize PNGs without a subprocess
+_HAS_LIBIMAGEQUANT = features.check_feature('libimagequant')
+
+
+def _pngquant_quality_to_mse(quality):
+    """
+    libimagequant's quality_to_mse() curve, rescaled to a plain per-channel MSE on 0-255 values
+    (what pngquant reports), so an in-process quantization can be held to a pngquant --quality floor.
+    """
+    extra_low_quality_fudge = max(0.0, 0.016 / (0.001 + quality) - 0.001)
+    mse = extra_low_quality_fudge + 2.5 / (210.0 + quality) ** 1.2 * (100.1 - quality) / 100.0
+    return mse * 65536.0 / 6.0
+
+
+# pngquant was run with --quality 40-80: results below 40 are rejected and the PNG stays lossless
+PNG_QUANTIZE_MAX_MSE = _pngquant_quality_to_mse(40)
+
+
+def _quantization_mse(source, quantized):
+    """
+    Mean squared error per channel between an RGB/RGBA image and its quantized version.
+    """
+    diff = ImageChops.difference(source, quantized.convert(source.mode))
+    rms = ImageStat.Stat(diff).rms
+    return sum(r * r for r in rms) / len(rms)
+
+@worker_process_init.connect
+def _enable_pillow_block_pool(**kwargs):
+    """
+    Has Pillow keep freed image-memory blocks in a per-process pool and hand them to the next
+    image of the same size, instead of returning multi-MB buffers to malloc after every job.
+    """
+    Image.core.set_blocks_max(settings.PILLOW_BLOCKS_MAX)
+
+
+@worker_process_shutdown.connect
+def _clear_pillow_block_pool(**kwargs):
+    Image.core.clear_cache()
+
+
+# Output formats written through libvips; anything else (GIF/BMP/TIFF) goes through Pillow
+_VIPS_SAVERS = {
+    'JPEG': 'jpegsave',
+    'PNG': 'pngsave',
+    'WEBP': 'webpsave',
+}
+
+
+def _process_with_vips(src_path, dst_path, width, height, quality, output_format):
+    """
+    Resizes and/or re-encodes an image with libvips, which streams pixels through its pipeline
+    instead of decoding the whole image into memory. width/height are the exact target size,
+    or None to keep the original size.
+    Returns False if libvips is unavailable or fails, so the caller can fall back to Pillow.
+    """
+    if pyvips is None or output_format not in _VIPS_SAVERS:
+        return False
+
+    try:
+        if width is not None and height is not None:
+            # Shrink-on-load: JPEG/WebP are decoded at a reduced scale before the final resample.
+            # no_rotate keeps the stored orientation, matching the Pillow path.
+            image = pyvips.Image.thumbnail(src_path, width, height=height, size='force', no_rotate=True)
+        else:
+            image = pyvips.Image.new_from_file(src_path, access='sequential')
+
+        save_params = {'strip': True}
+        if output_format == 'JPEG':
+            # JPEG has no alpha channel, so composite onto white
+            if image.hasalpha():
+                image = image.flatten(background=[255, 255, 255])
+            # quality 0 is valid input; libvips' JPEG Q starts at 1
+            save_params.update(Q=75 if quality is None else max(quality, 1), optimize_coding=True)
+        elif output_format != 'PNG' and quality is not None:
+            # PNG never arrives with a quality: compressor PNGs go through the quantizer instead
+            save_params['Q'] = quality
+
+        getattr(image, _VIPS_SAVERS[output_format])(dst_path, **save_params)
+        return True
+    except pyvips.Error as e:
+        logger.warning(f"libvips failed for {src_path}: {e}. Falling back to Pillow.")
+        return False
+
+
+# Mapping of user-friendly format strings to Pillow's internal format names
+_TARGET_FORMAT_TO_PIL = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'gif': 'GIF',
+    'webp': 'WEBP',
+    'bmp': 'BMP',
+    'tiff': 'TIFF',
+    'tif': 'TIFF'
+}
+_SUPPORTED_TARGET_FORMATS = ', '.join(_TARGET_FORMAT_TO_PIL)
+
+# MEDIA_URL with exactly one trailing slash, for building output URLs by concatenation
+_MEDIA_URL_PREFIX = settings.MEDIA_URL.rstrip('/') + '/'
+
+# Columns written when a job finishes, successfully or not
+_TERMINAL_FIELDS = ['status', 'output_url', 'output_relative_path', 'error_message', 'updated_at']
+
+
+# Per-process (decoder, encoder) pair; False once we know this worker has no usable GPU
+_gpu_codec = None
+
+
+def _get_gpu_codec():
+    """
+    Lazily creates this worker process's nvImageCodec decoder/encoder, which are then reused
+    for every job. CUDA contexts don't survive fork(), so this can't happen at import time in
+    the Celery parent. Returns None when there's no usable CUDA device.
+    """
+    global _gpu_codec
+    if _gpu_codec is None:
+        try:
+            _gpu_codec = (nvimgcodec.Decoder(), nvimgcodec.Encoder())
+        except Exception as e:
+            logger.info(f"nvImageCodec unavailable, using CPU codecs: {e}")
+            _gpu_codec = False
+    return _gpu_codec or None
+
+
+def _process_with_nvimgcodec(src_path, dst_path, source_mode, quality, output_format):
+    """
+    Decodes and re-encodes an image on the GPU with nvImageCodec (nvJPEG for the encode).
+    Only handles JPEG output from RGB sources: the GPU decoder drops alpha rather than
+    flattening it. Returns False when the GPU path doesn't apply or fails.
+    """
+    if nvimgcodec is None or output_format != 'JPEG' or source_mode != 'RGB':
+        return False
+
+    codec = _get_gpu_codec()
+    if codec is None:
+        return False
+    decoder, encoder = codec
+
+    try:
+        # Keep the stored orientation, matching the Pillow and libvips paths
+        image = decoder.read(src_path, params=nvimgcodec.DecodeParams(apply_exif_orientation=False))
+        if image is None:
+            return False
+        params = nvimgcodec.EncodeParams(quality=quality) if quality is not None else None
+        encoder.write(dst_path, image, codec='jpeg', params=params)
+        return True
+    except Exception as e:
+        logger.warning(f"nvImageCodec failed for {src_path}: {e}. Falling back to CPU codecs.")
+        return False
+
+
 @shared_task(bind=True)  # bind=True allows access to task instance properties like self.request
 def process_image_task(self, job_id):
     """
@@ -79,10 +267,14 @@ def process_image_task(self, job_id):
     """
     job = None
     try:
-        # Retrieve the job instance from the database using only the job ID
-        job = ImageConversionJob.objects.get(id=job_id)
-        job.status = 'PROCESSING'
-        job.save()
+        # Retrieve the job and its upload in one query, limited to the columns the task reads or writes
+        job = ImageConversionJob.objects.select_related('uploaded_file').only(
+            'id', 'tool_type', 'quality', 'width', 'height', 'target_format',
+            'status', 'output_url', 'output_relative_path', 'error_message', 'uploaded_file__file',
+        ).get(id=job_id)
+        # Flag the job for the status endpoint with a plain UPDATE; the instance is written once, at the end
+        ImageConversionJob.objects.filter(id=job_id).update(status='PROCESSING', updated_at=timezone.now())
+        invalidate_job_status(ImageConversionJob.STATUS_CACHE_PREFIX, job_id)
 
         tool_type = job.tool_type
         logger.info(f"Task {self.request.id}: Starting image processing for job ID: {job_id} with tool_type: {tool_type}")
@@ -95,18 +287,21 @@ def process_image_task(self, job_id):
         if not os.path.exists(absolute_source_file_path):
             raise FileNotFoundError(f"Source file does not exist at {absolute_source_file_path}")
 
-        # Open the image once to be used by all processing logic
+        # Open the image once to be used by all processing logic. Opened by path, Pillow owns the
+        # file: ImageFile.load() memory-maps raw formats itself, and decoders that need a real file
+        # descriptor (libtiff for LZW/deflate/JPEG TIFFs) get one.
         with Image.open(absolute_source_file_path) as img:
-            processed_img = img.copy()
             original_width, original_height = img.size
             original_format = img.format
 
             # Define output directory for processed files, unique per job
             output_dir_relative_to_media_root = os.path.join('image_tool_processed', str(job.id))
-            os.makedirs(os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root), exist_ok=True)
+            output_dir_abs = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root)
+            os.makedirs(output_dir_abs, exist_ok=True)
+            output_relative_prefix = f"image_tool_processed/{job.id}/"
             
             base_filename = os.path.splitext(os.path.basename(file_path_relative_to_media_root))[0]
-            download_url = None  # Initialize download URL to None
+            output_relative_path = None  # Set by the branch that writes the output
 
             if tool_type == 'image_resizer':
                 # --- Resizing Logic ---
@@ -115,29 +310,46 @@ def process_image_task(self, job_id):
                 width = job.width
                 height = job.height
 
-                # Only resize if dimensions are provided
-                if width is not None and height is not None:
-                    processed_img = processed_img.resize((width, height), Image.LANCZOS)
-                elif width is not None:
-                    new_height = int(original_height * (width / original_width))
-                    processed_img = processed_img.resize((width, new_height), Image.LANCZOS)
-                elif height is not None:
-                    new_width = int(original_width * (height / original_height))
-                    processed_img = processed_img.resize((new_width, height), Image.LANCZOS)
+                # Only resize if dimensions are provided; a single dimension keeps the aspect ratio
+                target_width, target_height = width, height
+                if width is not None and height is None:
+                    target_height = int(original_height * (width / original_width))
+                elif height is not None and width is None:
+                    target_width = int(original_width * (height / original_height))
                 
                 # Determine output format. If target_format is provided, use it. Otherwise, keep original.
                 output_format = job.target_format.upper() if job.target_format else original_format
                 output_filename = f"resized_{base_filename}.{output_format.lower()}"
-                output_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, output_filename)
+                output_full_absolute_path = os.path.join(output_dir_abs, output_filename)
                 
-                # Handle JPEG compatibility (covers RGBA/LA/P/others)
-                if output_format == 'JPEG':
-                    processed_img = convert_to_rgb_for_jpeg(processed_img)
+                if target_width is None and output_format == original_format:
+                    # Nothing to resize or re-encode, so hand back the original bytes
+                    shutil.copyfile(absolute_source_file_path, output_full_absolute_path)
+                elif not _process_with_vips(absolute_source_file_path, output_full_absolute_path,
+                                            target_width, target_height, None, output_format):
+                    if (original_format == 'JPEG' and target_width is not None
+                            and target_width * 2 < original_width and target_height * 2 < original_height):
+                        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale (never below twice the target),
+                        # so LANCZOS only has to finish the last step
+                        img.draft(img.mode, (target_width * 2, target_height * 2))
+
+                    # resize()/convert() return new images and save() doesn't mutate, so no copy is needed
+                    processed_img = img
+                    # img.size reflects any draft scaling, so a downscaled decode skips the threaded path
+                    decoded_width, decoded_height = img.size
+                    if target_width is not None and decoded_width * decoded_height > PARALLEL_RESIZE_MIN_PIXELS:
+                        processed_img = _parallel_resize(processed_img, (target_width, target_height))
+                    elif target_width is not None:
+                        processed_img = processed_img.resize((target_width, target_height), Image.LANCZOS)
+
+                    # Handle JPEG compatibility (covers RGBA/LA/P/others)
+                    if output_format == 'JPEG':
+                        processed_img = convert_to_rgb_for_jpeg(processed_img)
 
-                # Save the resized image
-                processed_img.save(output_full_absolute_path, format=output_format)
+                    # Save the resized image
+                    processed_img.save(output_full_absolute_path, format=output_format)
                 
-                download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, output_filename).replace('\\', '/')
+                output_relative_path = output_relative_prefix + output_filename
 
             elif tool_type == 'image_compressor':
                 # --- Compression Logic (with special PNG handling) ---
@@ -148,11 +360,23 @@ def process_image_task(self, job_id):
                 quality = job.quality
                 
                 output_filename = f"compressed_{base_filename}.{output_format.lower()}"
-                output_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, output_filename)
+                output_full_absolute_path = os.path.join(output_dir_abs, output_filename)
 
-                if output_format == 'PNG':
+                if output_format == 'PNG' and _HAS_LIBIMAGEQUANT:
+                    # pngquant's library, in-process and on the already-open image. Pillow doesn't expose
+                    # libimagequant's quality limits, so the error is measured here instead
+                    logger.info("PNG compression requested. Quantizing with libimagequant.")
+                    source = img if img.mode in ('RGB', 'RGBA') else img.convert('RGBA')
+                    quantized = source.quantize(colors=256, method=Image.Quantize.LIBIMAGEQUANT)
+                    if _quantization_mse(source, quantized) <= PNG_QUANTIZE_MAX_MSE:
+                        quantized.save(output_full_absolute_path, format='PNG', optimize=True)
+                    else:
+                        # Same outcome as pngquant missing its quality floor: keep the PNG lossless
+                        logger.info("Quantized PNG is below quality 40. Saving losslessly with Pillow instead.")
+                        img.save(output_full_absolute_path, format='PNG', optimize=True)
+                elif output_format == 'PNG':
                     # Special handling for PNG using pngquant
-                    logger.info("PNG compression requested. Running pngquant with quality 20-70.")
+                    logger.info("PNG compression requested. Running pngquant with quality 40-80.")
                     temp_output_path = f"{output_full_absolute_path}.tmp"
                     
                     try:
@@ -167,13 +391,17 @@ def process_image_task(self, job_id):
                         logger.info("PNG compression successful.")
                     except FileNotFoundError:
                         logger.warning("pngquant not found. Falling back to Pillow PNG compression.")
-                        processed_img.save(output_full_absolute_path, format='PNG', optimize=True)
+                        img.save(output_full_absolute_path, format='PNG', optimize=True)
                     except subprocess.CalledProcessError as e:
                         logger.error(f"pngquant command failed with error: {getattr(e, 'stderr', b'').decode(errors='ignore')}. Falling back to Pillow.")
-                        processed_img.save(output_full_absolute_path, format='PNG', optimize=True)
-                else:
+                        img.save(output_full_absolute_path, format='PNG', optimize=True)
+                elif not (_process_with_nvimgcodec(absolute_source_file_path, output_full_absolute_path,
+                                                   img.mode, quality, output_format)
+                          or _process_with_vips(absolute_source_file_path, output_full_absolute_path,
+                                                None, None, quality, output_format)):
                     # Compression for other formats using Pillow
                     logger.info(f"Applying Pillow compression for format: {output_format}")
+                    processed_img = img
                     save_params = {'optimize': True}
                     if quality is not None:
                         save_params['quality'] = quality
@@ -184,51 +412,50 @@ def process_image_task(self, job_id):
 
                     processed_img.save(output_full_absolute_path, format=output_format, **save_params)
                 
-                download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, output_filename).replace('\\', '/')
+                output_relative_path = output_relative_prefix + output_filename
             
             elif tool_type == 'image_converter':
                 # --- Format Conversion Logic ---
                 logger.info("Tool type is 'image_converter'. Applying format conversion logic.")
                 
-                # Define a mapping for user-friendly format strings to Pillow's internal format names
-                format_mapping = {
-                    'jpg': 'JPEG',
-                    'jpeg': 'JPEG',
-                    'png': 'PNG',
-                    'gif': 'GIF',
-                    'webp': 'WEBP',
-                    'bmp': 'BMP',
-                    'tiff': 'TIFF',
-                    'tif': 'TIFF'
-                }
-                
                 # Get the target format from the job and convert it to the correct PIL format name
                 target_format_lower = job.target_format.lower()
-                output_format = format_mapping.get(target_format_lower)
+                output_format = _TARGET_FORMAT_TO_PIL.get(target_format_lower)
 
                 if not output_format:
-                    raise ValueError(f"Unsupported target format: {job.target_format}. Supported formats are: {', '.join(format_mapping.keys())}.")
+                    raise ValueError(f"Unsupported target format: {job.target_format}. Supported formats are: {_SUPPORTED_TARGET_FORMATS}.")
                 
                 output_filename = f"converted_{base_filename}.{target_format_lower}"
-                output_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, output_filename)
+                output_full_absolute_path = os.path.join(output_dir_abs, output_filename)
                 
-                # Ensure JPEG-compatibility (covers RGBA/LA/P/others)
-                if output_format == 'JPEG':
-                    processed_img = convert_to_rgb_for_jpeg(processed_img)
+                if output_format == original_format:
+                    # Same codec in and out: Image.open() has only read the header, so copy the bytes
+                    # rather than paying for a lossy decode/re-encode
+                    shutil.copyfile(absolute_source_file_path, output_full_absolute_path)
+                elif not (_process_with_nvimgcodec(absolute_source_file_path, output_full_absolute_path,
+                                                   img.mode, None, output_format)
+                          or _process_with_vips(absolute_source_file_path, output_full_absolute_path,
+                                                None, None, None, output_format)):
+                    processed_img = img
+                    # Ensure JPEG-compatibility (covers RGBA/LA/P/others)
+                    if output_format == 'JPEG':
+                        processed_img = convert_to_rgb_for_jpeg(processed_img)
 
-                # Save the converted image
-                processed_img.save(output_full_absolute_path, format=output_format)
+                    # Save the converted image
+                    processed_img.save(output_full_absolute_path, format=output_format)
 
-                download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, output_filename).replace('\\', '/')
+                output_relative_path = output_relative_prefix + output_filename
 
             else:
                 raise ValueError(f"Unknown tool_type: {tool_type}")
             
             # Update job status and URL if the processing was successful
-            if download_url:
-                job.output_url = download_url
+            if output_relative_path:
+                # Stored as-is so downloads and cleanup never have to parse output_url
+                job.output_relative_path = output_relative_path
+                job.output_url = _MEDIA_URL_PREFIX + output_relative_path
                 job.status = 'COMPLETED'
-                job.save()
+                job.save(update_fields=_TERMINAL_FIELDS)
                 logger.info(f"Task {self.request.id}: Job {job_id} status updated to COMPLETED. Output URL stored.")
 
     except ImageConversionJob.DoesNotExist:
@@ -238,26 +465,108 @@ def process_image_task(self, job_id):
         if job:
             job.status = 'FAILED'
             job.error_message = f"Processing failed: Source file not found or accessible. Error: {e}"
-            job.save()
+            job.save(update_fields=_TERMINAL_FIELDS)
     except Exception as e:
         logger.error(f"Task {self.request.id}: An unexpected error occurred for job {job_id}: {e}", exc_info=True)
         if job:
             job.status = 'FAILED'
             job.error_message = f"Processing failed due to an internal error: {str(e)}"
-            job.save()
+            job.save(update_fields=_TERMINAL_FIELDS)
+
+# Walk MEDIA_ROOT by directory file descriptor where the platform allows it, so every stat and
+# unlink is an *at() call on a bare name rather than a full path the kernel resolves again
+_CLEANUP_USES_DIR_FD = (
+    os.scandir in os.supports_fd
+    and {os.open, os.stat, os.unlink} <= os.supports_dir_fd
+)
+
+
+def _iter_media_files(root):
+    """
+    Yields a DirEntry for every regular file under root. DirEntry caches what
+    scandir already read, so type checks and stat() cost no extra syscalls per file.
+    """
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _iter_media_files(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+    except FileNotFoundError:
+        return
+
+
+def _iter_media_files_at(dir_fd):
+    """
+    Like _iter_media_files(), but walks from an open directory fd and yields
+    (dir_fd, DirEntry) pairs, so callers can unlink relative to the directory.
+    """
+    with os.scandir(dir_fd) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                try:
+                    sub_fd = os.open(entry.name, os.O_RDONLY | os.O_DIRECTORY, dir_fd=dir_fd)
+                except FileNotFoundError:
+                    continue
+                try:
+                    yield from _iter_media_files_at(sub_fd)
+                finally:
+                    os.close(sub_fd)
+            elif entry.is_file(follow_symlinks=False):
+                yield dir_fd, entry
+
 
 @shared_task
 def cleanup_old_media():
     media_path = settings.MEDIA_ROOT
-    threshold = datetime.datetime.now() - datetime.timedelta(days=1)  # delete files older than 1 day
+    threshold_ts = (datetime.datetime.now() - datetime.timedelta(days=1)).timestamp()  # delete files older than 1 day
 
     deleted = 0
-    for dirpath, _, filenames in os.walk(media_path):
-        for file in filenames:
-            file_path = os.path.join(dirpath, file)
-            if os.path.isfile(file_path):
-                modified_time = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                if modified_time < threshold:
-                    os.remove(file_path)
+    if _CLEANUP_USES_DIR_FD:
+        try:
+            root_fd = os.open(media_path, os.O_RDONLY | os.O_DIRECTORY)
+        except FileNotFoundError:
+            return f"{deleted} old files deleted."
+        try:
+            for dir_fd, entry in _iter_media_files_at(root_fd):
+                if entry.stat(follow_symlinks=False).st_mtime < threshold_ts:
+                    try:
+                        os.unlink(entry.name, dir_fd=dir_fd)
+                    except FileNotFoundError:
+                        continue
                     deleted += 1
-    return f"{deleted} old files deleted."
\ No newline at end of file
+        finally:
+            os.close(root_fd)
+    else:
+        for entry in _iter_media_files(media_path):
+            if entry.stat(follow_symlinks=False).st_mtime < threshold_ts:
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    continue
+                deleted += 1
+    return f"{deleted} old files deleted."
+
+@shared_task
+def unlink_paths(paths):
+    """
+    Removes files left behind by deleted UploadedFile/ImageConversionJob rows,
+    along with their per-upload/per-job directory once it is empty.
+    """
+    for path in paths:
+        try:
+            os.remove(path)
+            logger.info(f"Deleted file: {path}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error deleting file {path}: {e}", exc_info=True)
+            continue
+
+        # Try to remove the unique directory if it becomes empty
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError as e:
+            if e.errno not in (errno.ENOTEMPTY, errno.ENOENT):
+                logger.error(f"Error deleting directory for {path}: {e}", exc_info=True)
@@ -5,14 +5,22 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny
 from django.conf import settings # Make sure settings is imported
 from django.core.files.storage import default_storage # Keep this import, though we'll use os.path more directly
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.db import transaction
+from django.core.cache import cache
 import os
+import mimetypes
 import uuid
 import json
-from .tasks import process_image_task
+from urllib.parse import quote
 from .models import ImageConversionJob, UploadedFile
 from .serializers import ImageConversionJobSerializer
 from .permissions import HasConversionAllowance
+from opustools_project.utils import job_status_cache_key, job_status_cache_timeout
+
+# Bytes read per chunk when streaming a download (FileResponse defaults to 4 KiB)
+DOWNLOAD_BLOCK_SIZE = 4 * 1024 * 1024
 
 class ImageConversionView(APIView):
     parser_classes = (MultiPartParser, FormParser)
@@ -33,10 +41,12 @@ class ImageConversionView(APIView):
         if serializer.is_valid():
             job = serializer.save(user=request.user if request.user.is_authenticated else None)
 
-            uploaded_file_instance = job.uploaded_file
-            file_path_relative_to_media_root = uploaded_file_instance.file.name
-
-            process_image_task.delay(job_id=job.id)
+            # Enqueue only once the job row is committed and visible to the worker.
+            # Passthrough jobs are already COMPLETED and need no processing.
+            if job.status != 'COMPLETED':
+                # Imported here so web workers don't load Pillow/libvips until a job is actually queued
+                from .tasks import process_image_task
+                transaction.on_commit(lambda: process_image_task.delay(job_id=str(job.id)))
 
             return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         else:
@@ -49,12 +59,17 @@ class ImageConversionJobStatusView(generics.RetrieveAPIView):
     permission_classes = [AllowAny]
 
     def get(self, request, *args, **kwargs):
-        try:
-            instance = self.get_object()
-            serializer = self.get_serializer(instance)
-            return Response(serializer.data)
-        except Http404:
-            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        # Pollers hit this every few seconds; serve the serialized job from cache when possible
+        cache_key = job_status_cache_key(ImageConversionJob.STATUS_CACHE_PREFIX, kwargs[self.lookup_field])
+        data = cache.get(cache_key)
+        if data is None:
+            try:
+                instance = self.get_object()
+            except Http404:
+                return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+            data = dict(self.get_serializer(instance).data)
+            cache.set(cache_key, data, job_status_cache_timeout(data['status']))
+        return Response(data)
 
 class ImageConversionJobDownloadView(APIView):
     permission_classes = [AllowAny]
@@ -62,7 +77,7 @@ class ImageConversionJobDownloadView(APIView):
     def get(self, request, job_id, *args, **kwargs):
         try:
             # Use 'id' to lookup the job, as that's your primary_key UUIDField
-            job = ImageConversionJob.objects.get(id=job_id)
+            job = ImageConversionJob.objects.only('status', 'output_url', 'output_relative_path').get(id=job_id)
         except ImageConversionJob.DoesNotExist:
             raise Http404("Job not found.")
 
@@ -70,35 +85,45 @@ class ImageConversionJobDownloadView(APIView):
         if job.status != 'COMPLETED' or not job.output_url:
             return Response({"error": "File not ready for download or conversion failed."}, status=status.HTTP_404_NOT_FOUND)
 
-        # --- THE CRUCIAL CHANGE IS HERE ---
-        # 1. Get the URL from the job
-        output_url = job.output_url
+        # 1. Path relative to MEDIA_ROOT, stored by the task alongside output_url
+        relative_path_in_media = job.get_output_relative_path()
 
-        # 2. Strip MEDIA_URL prefix to get the path relative to MEDIA_ROOT
-        #    This is crucial to avoid the SuspiciousFileOperation
-        if output_url.startswith(settings.MEDIA_URL):
-            relative_path_in_media = output_url[len(settings.MEDIA_URL):]
-        else:
-            # This case should ideally not happen if tasks.py always generates URLs correctly
-            # But it's a safeguard.
-            return Response({"error": "Invalid output URL format."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        # 3. Construct the absolute file system path
+        # 2. Construct the absolute file system path
         output_file_path = os.path.join(settings.MEDIA_ROOT, relative_path_in_media)
 
-        # 4. Verify the file exists on the filesystem
-        if not os.path.exists(output_file_path):
-            return Response({"error": "Converted file not found on server."}, status=status.HTTP_404_NOT_FOUND)
-
-        # 5. Determine the file name for Content-Disposition header
+        # 3. Determine the file name for Content-Disposition header
         file_name = os.path.basename(output_file_path)
+
+        # Let nginx send the file with sendfile(2); the worker only returns headers (and nginx
+        # answers 404 itself if the file is gone)
+        if settings.USE_X_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=mimetypes.guess_type(file_name)[0] or 'application/octet-stream')
+            response['X-Accel-Redirect'] = settings.X_ACCEL_REDIRECT_PREFIX + quote(relative_path_in_media)
+            response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+            return response
         
         try:
-            # 6. Open the file directly using its absolute path
+            # 4. Open the file directly using its absolute path
             #    We cannot use default_storage.open() here because it would internally
             #    perform safe_join with MEDIA_ROOT, leading to the same error.
-            response = FileResponse(open(output_file_path, 'rb'), content_type='application/octet-stream')
-            response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+            #    Opening is also the existence check: no separate stat, and no window between the two.
+            output_file = open(output_file_path, 'rb')
+
+            # Processed files are never rewritten in place, so size+mtime identify the content;
+            # a client revalidating a copy it already holds gets a 304 instead of the whole file
+            file_stat = os.fstat(output_file.fileno())
+            etag = f'"{file_stat.st_size:x}-{int(file_stat.st_mtime):x}"'
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                output_file.close()
+                return HttpResponseNotModified(headers={'ETag': etag})
+
+            # FileResponse sets Content-Length and an RFC 6266 Content-Disposition from the open file
+            response = FileResponse(output_file, as_attachment=True, filename=file_name,
+                                    content_type='application/octet-stream')
+            response.block_size = DOWNLOAD_BLOCK_SIZE
+            response['ETag'] = etag
             return response
+        except FileNotFoundError:
+            return Response({"error": "Converted file not found on server."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": f"Could not prepare file for download: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+from datetime import timedelta
 from pathlib import Path
 from decouple import config, Csv
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
     'blog',
     'corsheaders',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt.token_blacklist',
     'authentication',
     'django_extensions',
     'django_celery_beat',
@@ -103,6 +105,12 @@ DATABASES = {
 }
 
 
+# Authentication backends
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.EmailOrUsernameBackend', # ModelBackend that also accepts an email address
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -125,6 +133,21 @@ AUTH_PASSWORD_VALIDATORS = [
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Large uploads are spooled to a temp file; keeping it on the same filesystem as MEDIA_ROOT
+# lets FileSystemStorage save them with a rename instead of copying the bytes a second time.
+# Created at startup by the tool apps (see ensure_upload_temp_dir), not here
+FILE_UPLOAD_TEMP_DIR = config("FILE_UPLOAD_TEMP_DIR", default=os.path.join(MEDIA_ROOT, '.upload_tmp'))
+
+# Hand downloads to nginx via X-Accel-Redirect instead of streaming them through a Django worker.
+# Requires an internal location in front of MEDIA_ROOT, e.g.:
+#   location /protected/ { internal; alias /path/to/media/; sendfile on; tcp_nopush on; }
+USE_X_ACCEL_REDIRECT = config("USE_X_ACCEL_REDIRECT", default=False, cast=bool)
+X_ACCEL_REDIRECT_PREFIX = '/protected/'
+
+# Number of reverse proxies in front of Django that append to X-Forwarded-For. 0 means the app is
+# reached directly and REMOTE_ADDR is the client; the header is then ignored, since clients can forge it
+NUM_TRUSTED_PROXIES = config("NUM_TRUSTED_PROXIES", default=0, cast=int)
+
 
 
 # Internationalization
@@ -153,23 +176,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Celery + Redis
 CELERY_BROKER_URL = config("REDIS_URL")
 CELERY_RESULT_BACKEND = config("REDIS_URL")
-CELERY_ACCEPT_CONTENT = ['json']
-CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
+# msgpack is denser and faster to (de)serialize than JSON; json stays accepted so messages
+# queued by an older deploy still drain. Task arguments must be msgpack-native (UUIDs as str).
+CELERY_ACCEPT_CONTENT = ['msgpack', 'json']
+CELERY_TASK_SERIALIZER = 'msgpack'
+CELERY_RESULT_SERIALIZER = 'msgpack'
+CELERY_TASK_COMPRESSION = 'zstd'
+
+# delay()/apply_async() already borrow a connection from the app's producer pool; size it to
+# the threads per web process so dispatch never waits on (or reopens) a broker connection,
+# and keep idle pooled sockets alive rather than reconnecting after the broker drops them
+CELERY_BROKER_POOL_LIMIT = config("CELERY_BROKER_POOL_LIMIT", default=10, cast=int)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'socket_keepalive': True,
+    'health_check_interval': 30,
+}
 CELERY_TIMEZONE = 'Africa/Lagos' # Adjusted for your current location
 
+# Pillow image-memory blocks each worker process keeps for reuse instead of freeing (0 disables)
+PILLOW_BLOCKS_MAX = config("PILLOW_BLOCKS_MAX", default=8, cast=int)
+
+# Shared cache (Redis) so cached lookups are consistent across gunicorn workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config("CACHE_URL", default=config("REDIS_URL")),
+        'KEY_PREFIX': 'opustools',
+    }
+}
+
 # Django REST Framework configuration
 REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication', # For Django session auth (CSRF token)
-        'rest_framework.authentication.TokenAuthentication',   # For Token-based auth
+        'authentication.auth.CachedJWTAuthentication',     # For JWT auth ("Bearer" header)
+        'authentication.auth.CachedTokenAuthentication',   # For legacy DRF tokens still held by clients
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny', # Default is to allow any, fine for most cases, override per view
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'opustools_project.renderers.OrjsonRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
@@ -188,6 +236,15 @@ REST_FRAMEWORK = {
     ],
 }
 
+# JWT settings
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': True, # Requires rest_framework_simplejwt.token_blacklist
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
+
 # opustools_project/opustools_project/settings.py
 
 # CORS settings for frontend communication
@@ -0,0 +1,128 @@
+# opustools_project/utils.py
+
+import datetime
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# [timestamp, iso date] of the last refresh; today's date is recomputed at most once a minute
+_today_cache = [0, '']
+
+
+def today_str():
+    """
+    Today's date as an ISO string, for keying per-day counters.
+    """
+    t = int(time.time())
+    if t - _today_cache[0] > 60:
+        _today_cache[:] = [t, datetime.date.today().isoformat()]
+    return _today_cache[1]
+
+
+def ensure_upload_temp_dir():
+    """
+    Creates FILE_UPLOAD_TEMP_DIR if it is missing. Called from the tool apps' ready() so settings
+    stay free of side effects; a read-only MEDIA_ROOT (collectstatic, image builds) only logs.
+    """
+    try:
+        os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Could not create FILE_UPLOAD_TEMP_DIR {settings.FILE_UPLOAD_TEMP_DIR}: {e}")
+
+
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7): a 48-bit Unix millisecond timestamp followed by
+    random bits. Used as a primary-key default so new rows land at the right-hand edge of
+    the B-tree instead of at random leaves.
+    """
+    value = (time.time_ns() // 1_000_000 & 0xFFFF_FFFF_FFFF) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = value & ~(0xF << 76) | 0x7 << 76  # version 7
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+def incr_expiring_counter(key, timeout):
+    """
+    Atomically increments a cache counter that expires timeout seconds after it is created, and
+    returns the new value. A counter that expires between add() and incr() starts over at 1.
+    """
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired or evicted since add(): this is the first use of a fresh window
+        if cache.add(key, 1, timeout=timeout):
+            return 1
+        return cache.incr(key)  # a concurrent request recreated it first
+
+
+def consume_daily_allowance(key_prefix, client_id, limit):
+    """
+    Counts one use of a per-client daily allowance and returns whether it was within limit.
+    Uses an atomic cache counter; rejected attempts are taken back off, so they don't count.
+    """
+    key = f"{key_prefix}:{client_id}:{today_str()}"
+    if incr_expiring_counter(key, 86400) > limit:
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass  # expired in the meantime; nothing left to take back
+        return False
+    return True
+
+
+def get_client_ip(request):
+    """
+    Returns the client's IP address. Behind NUM_TRUSTED_PROXIES proxies, REMOTE_ADDR is the
+    nearest proxy, and the client is the entry the outermost proxy appended to X-Forwarded-For.
+    Entries further left come from the client and are never trusted.
+    """
+    num_proxies = settings.NUM_TRUSTED_PROXIES
+    if num_proxies > 0:
+        forwarded_for = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        if len(forwarded_for) >= num_proxies and forwarded_for[-num_proxies]:
+            return forwarded_for[-num_proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+# How long (in seconds) a job's serialized status stays cached: briefly while the
+# job can still change, much longer once it has finished
+JOB_STATUS_CACHE_TIMEOUT_ACTIVE = 15
+JOB_STATUS_CACHE_TIMEOUT_FINAL = 3600
+
+
+def job_status_cache_key(prefix, job_id):
+    """
+    Builds the cache key for a job's status payload, e.g. "imgjob:<uuid>".
+    """
+    return f"{prefix}:{job_id}"
+
+
+def job_status_cache_timeout(status):
+    """
+    Cache TTL for a status payload, depending on whether the job can still change.
+    """
+    if status in ('COMPLETED', 'FAILED'):
+        return JOB_STATUS_CACHE_TIMEOUT_FINAL
+    return JOB_STATUS_CACHE_TIMEOUT_ACTIVE
+
+
+def invalidate_job_status(prefix, job_id):
+    """
+    Drops a job's cached status so the next poll reads it from the database.
+    """
+    cache.delete(job_status_cache_key(prefix, job_id))
+
+
+def invalidate_job_statuses(prefix, job_ids):
+    """
+    invalidate_job_status() for many jobs at once, e.g. after a bulk delete.
+    """
+    cache.delete_many([job_status_cache_key(prefix, job_id) for job_id in job_ids])
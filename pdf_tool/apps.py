@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PdfToolConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pdf_tool'
+
+    def ready(self):
+        from opustools_project.utils import ensure_upload_temp_dir
+        # Large uploads are spooled to FILE_UPLOAD_TEMP_DIR, and _pdf_to_jpegs renders pages there
+        ensure_upload_temp_dir()
@@ -1,10 +1,11 @@
 # --- models.py ---
-import uuid
 import os
+import errno
 from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
 import logging
+from opustools_project.utils import invalidate_job_status, uuid7
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,7 @@ class PdfUploadedFile(models.Model):
     """
     Represents an original file uploaded by the user specifically for the pdf_tool.
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     file = models.FileField(upload_to=pdf_uploaded_file_path)
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -39,13 +40,14 @@ class PdfUploadedFile(models.Model):
         Deletes the associated file from storage when the PdfUploadedFile model instance is deleted.
         """
         if self.file:
+            file_dir = os.path.dirname(self.file.path)
             try:
                 self.file.delete(save=False)
-                file_dir = os.path.dirname(self.file.path)
-                if os.path.exists(file_dir) and not os.listdir(file_dir):
-                    os.rmdir(file_dir)
+                # rmdir refuses non-empty directories itself, so no listdir() is needed first
+                os.rmdir(file_dir)
             except OSError as e:
-                logger.error(f"Error deleting uploaded PDF file {self.file.path}: {e}", exc_info=True)
+                if e.errno not in (errno.ENOTEMPTY, errno.ENOENT):
+                    logger.error(f"Error deleting uploaded PDF file {self.file.name}: {e}", exc_info=True)
         super().delete(*args, **kwargs)
 
 class PdfToolJob(models.Model):
@@ -79,7 +81,7 @@ class PdfToolJob(models.Model):
         ('low', 'Low Compression'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='pdf_tool_jobs')
     
     uploaded_files = models.ManyToManyField(
@@ -130,6 +132,11 @@ class PdfToolJob(models.Model):
         null=True, blank=True,
         help_text="URL to the processed file(s)."
     )
+    output_relative_path = models.CharField(
+        max_length=500,
+        null=True, blank=True,
+        help_text="Path of the processed file(s) relative to MEDIA_ROOT."
+    )
     error_message = models.TextField(
         null=True, blank=True,
         help_text="Detailed message if the job failed."
@@ -143,28 +150,56 @@ class PdfToolJob(models.Model):
         verbose_name_plural = "PDF Tool Jobs"
         db_table = 'pdf_tool_jobs'
         ordering = ['-created_at']
+        indexes = [
+            # Status/age scans (e.g. stale-job cleanup) become index range scans
+            models.Index(fields=['status', 'created_at'], name='pdfjob_status_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='pdfjob_user_created_idx'),
+        ]
+
+    # Cache key prefix for the serialized status polled by PdfToolJobStatusView
+    STATUS_CACHE_PREFIX = 'pdfjob'
 
     def __str__(self):
         return f"PDF Tool Job {self.id} | Type: {self.tool_type} | Status: {self.status}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Status pollers read a cached copy; make the next poll see this write
+        invalidate_job_status(self.STATUS_CACHE_PREFIX, self.pk)
+
+    def get_output_relative_path(self):
+        """
+        Path of the processed file relative to MEDIA_ROOT.
+        """
+        if self.output_relative_path:
+            return self.output_relative_path
+        # Jobs completed before output_relative_path existed only have the URL
+        return self.output_url.replace(settings.MEDIA_URL, '', 1)
     
     def delete(self, *args, **kwargs):
         """
         Deletes the associated processed file from storage when the job is deleted.
         """
         if self.output_url:
-            try:
-                relative_path_in_media = self.output_url.replace(settings.MEDIA_URL, '', 1)
-                full_path_to_file = os.path.join(settings.MEDIA_ROOT, relative_path_in_media)
-
-                if os.path.exists(full_path_to_file):
-                    os.remove(full_path_to_file)
-                    logger.info(f"Deleted processed file: {full_path_to_file}")
-
-                job_specific_dir = os.path.dirname(full_path_to_file)
-                if os.path.exists(job_specific_dir) and not os.listdir(job_specific_dir):
-                    os.rmdir(job_specific_dir)
-                    logger.info(f"Deleted empty directory: {job_specific_dir}")
+            full_path_to_file = os.path.join(settings.MEDIA_ROOT, self.get_output_relative_path())
+            job_specific_dir = os.path.dirname(full_path_to_file)
 
+            try:
+                os.remove(full_path_to_file)
+                logger.info(f"Deleted processed file: {full_path_to_file}")
+            except FileNotFoundError:
+                pass
             except OSError as e:
                 logger.error(f"Error deleting processed file for job {self.id}: {e}", exc_info=True)
+
+            # rmdir refuses non-empty directories itself, so no listdir() is needed first
+            try:
+                os.rmdir(job_specific_dir)
+                logger.info(f"Deleted empty directory: {job_specific_dir}")
+            except OSError as e:
+                if e.errno not in (errno.ENOTEMPTY, errno.ENOENT):
+                    logger.error(f"Error deleting directory for job {self.id}: {e}", exc_info=True)
+        job_id = self.pk
         super().delete(*args, **kwargs)
+        # Stop the status endpoint serving the deleted job from cache
+        invalidate_job_status(self.STATUS_CACHE_PREFIX, job_id)
@@ -2,7 +2,7 @@
 
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied
-import datetime
+from opustools_project.utils import consume_daily_allowance, get_client_ip
 
 class HasConversionAllowance(permissions.BasePermission):
     """
@@ -18,27 +18,17 @@ class HasConversionAllowance(permissions.BasePermission):
         if request.user and request.user.is_authenticated:
             return True
 
-        # Unauthenticated users have a limit based on their session
-        session = request.session
-        today_str = datetime.date.today().isoformat()
-        
-        # Initialize or retrieve conversion count for today
-        conversion_counts = session.get('pdf_conversion_counts', {})
-        current_day_count = conversion_counts.get(today_str, 0)
+        # For GET, HEAD, OPTIONS requests, always allow access
+        if request.method != 'POST':
+            return True
+
+        # Unauthenticated users have a limit based on their session (or IP if there is none yet)
+        client_id = request.session.session_key or get_client_ip(request)
 
         # Define the limit for unauthenticated users
         UNAUTH_CONVERSION_LIMIT = 2 # Example: 2 conversions per day for unauthenticated users
 
-        if request.method == 'POST':
-            if current_day_count >= UNAUTH_CONVERSION_LIMIT:
-                # If limit exceeded for a POST request, raise PermissionDenied with custom code
-                raise PermissionDenied(detail={'detail': self.message, 'code': self.code})
-            else:
-                # Increment count for successful POST
-                conversion_counts[today_str] = current_day_count + 1
-                session['pdf_conversion_counts'] = conversion_counts
-                session.modified = True # Ensure session is saved
-                return True
-        
-        # For GET, HEAD, OPTIONS requests, always allow access
-        return True
\ No newline at end of file
+        # If limit exceeded for a POST request, raise PermissionDenied with custom code
+        if not consume_daily_allowance('pdfquota', client_id, UNAUTH_CONVERSION_LIMIT):
+            raise PermissionDenied(detail={'detail': self.message, 'code': self.code})
+        return True
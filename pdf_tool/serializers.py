@@ -1,8 +1,28 @@
 # --- serializers.py ---
+from django.db import transaction
 from rest_framework import serializers
 from .models import PdfToolJob, PdfUploadedFile
 import json
 
+class FormJSONField(serializers.JSONField):
+    """
+    JSONField that also accepts its value JSON-encoded in a string, which is how it
+    arrives in a multipart form. Decoded once here, during is_valid().
+    """
+    default_error_messages = {
+        'invalid': 'Invalid JSON format.'
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            if not data:
+                return None
+            try:
+                data = json.loads(data)
+            except ValueError:
+                self.fail('invalid')
+        return super().to_internal_value(data)
+
 class PdfUploadedFileSerializer(serializers.ModelSerializer):
     """
     Serializer for the PdfUploadedFile model.
@@ -24,6 +44,11 @@ class PdfToolJobSerializer(serializers.ModelSerializer):
         required=False,
         help_text="File(s) to be processed. For conversion/splitting, upload a single file. For merging/compression, upload multiple."
     )
+    merge_order = FormJSONField(
+        required=False,
+        allow_null=True,
+        help_text="An ordered list of filenames to merge, e.g., ['file1.pdf', 'file2.pdf']."
+    )
     
     class Meta:
         model = PdfToolJob
@@ -36,29 +61,18 @@ class PdfToolJobSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         files_data = validated_data.pop('files', [])
 
-        # Manually parse merge_order if it arrives as a string
-        merge_order_data = validated_data.pop('merge_order', None)
-        if merge_order_data and isinstance(merge_order_data, str):
-            try:
-                # Load the JSON string into a proper Python list
-                validated_data['merge_order'] = json.loads(merge_order_data)
-            except json.JSONDecodeError:
-                raise serializers.ValidationError({"merge_order": "Invalid JSON format."})
-
         page_ranges = validated_data.pop('page_ranges', None)
 
-        job = PdfToolJob.objects.create(**validated_data)
-
-        if page_ranges:
-            job.page_ranges = page_ranges
-        job.save()
-
+        # The job, its uploads and the links between them commit together, each as a single INSERT
+        with transaction.atomic():
+            job = PdfToolJob.objects.create(page_ranges=page_ranges or None, **validated_data)
 
-        for file_data in files_data:
-            uploaded_file = PdfUploadedFile.objects.create(
-                file=file_data,
-                original_filename=file_data.name
-            )
-            job.uploaded_files.add(uploaded_file)
+            # One INSERT for all uploads (FileField.pre_save still writes each file to storage),
+            # and one for the M2M rows
+            uploaded_files = PdfUploadedFile.objects.bulk_create([
+                PdfUploadedFile(file=file_data, original_filename=file_data.name)
+                for file_data in files_data
+            ])
+            job.uploaded_files.add(*uploaded_files)
 
         return job
\ No newline at end of file
@@ -1,13 +1,19 @@
 # --- tasks.py ---
+import io
 import os
+import hashlib
+import shutil
 import logging
 import datetime
-import shutil
 import zipfile
-import uuid
 import subprocess
+import re
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from celery import shared_task
 from django.conf import settings
+from django.utils import timezone
 from PIL import Image
 import json
 
@@ -15,15 +21,222 @@ import json
 from pdf2docx import Converter
 from pdf2image import convert_from_path
 from pptx import Presentation
-import tabula
+import pdfplumber
 import pandas as pd
 from pypdf import PdfWriter, PdfReader # NEW: Import PdfWriter and PdfReader for merging and splitting
 
+try:
+    import pikepdf
+except ImportError:  # optional: libqpdf bindings, much faster than pypdf for merging and splitting
+    pikepdf = None
+
 # Import the models from the current app
 from .models import PdfToolJob, PdfUploadedFile # NEW: Import PdfUploadedFile as well
+from opustools_project.utils import invalidate_job_status
 
 logger = logging.getLogger(__name__)
 
+# pypdf and zipfile issue many small writes per object; a 1 MiB buffer turns them into a few large ones
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# How much of a failed gs run's stderr is kept for the log and the job's error_message
+GS_STDERR_TAIL_BYTES = 4096
+
+def _run_gs(source_path, output_path, gs_options):
+    """
+    Rewrites one PDF through Ghostscript's pdfwrite device with the given options.
+    """
+    gs_command = [
+        'gs',
+        '-sDEVICE=pdfwrite',
+        '-dCompatibilityLevel=1.4',
+        '-dNOPAUSE',
+        '-dBATCH',
+        '-dSAFER',
+        '-sOutputFile=' + output_path,
+        source_path
+    ]
+    gs_command[3:3] = gs_options
+
+    try:
+        # gs's per-page progress on stdout is discarded; only stderr is kept, for the error message
+        subprocess.run(gs_command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        gs_error = e.stderr[-GS_STDERR_TAIL_BYTES:].decode('utf-8', 'replace')
+        logger.error(f"Ghostscript command failed: {gs_error}")
+        raise RuntimeError(f"PDF compression failed: {gs_error}")
+    return output_path
+
+# Compressed outputs keyed by source content and gs options, so re-uploads of the same file skip gs.
+# Entries are hard links to job outputs; cleanup_old_media expires them with the rest of MEDIA_ROOT
+GS_CACHE_DIR = os.path.join(settings.MEDIA_ROOT, 'gs_cache')
+
+def _gs_cache_path(source_path, gs_options):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\0'.join(gs_options).encode())
+    with open(source_path, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(OUTPUT_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return os.path.join(GS_CACHE_DIR, digest.hexdigest() + '.pdf')
+
+def _link_or_copy(source_path, output_path):
+    """
+    Hard-links source_path to output_path, replacing any file already there; copies instead on
+    filesystems without hard links. Raises FileNotFoundError if source_path doesn't exist.
+    """
+    try:
+        os.remove(output_path)  # left by an earlier attempt at the same job
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(source_path, output_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source_path, output_path)
+
+def _compress_pdf_cached(source_path, output_path, gs_options, compress=_run_gs):
+    """
+    Runs compress(source_path, output_path, gs_options) unless an identical source was already
+    compressed with the same options, in which case the earlier output is linked into place.
+    """
+    cache_path = _gs_cache_path(source_path, gs_options)
+    try:
+        _link_or_copy(cache_path, output_path)
+    except FileNotFoundError:
+        compress(source_path, output_path, gs_options)
+        try:
+            os.makedirs(GS_CACHE_DIR, exist_ok=True)
+            os.link(output_path, cache_path)
+        except FileExistsError:
+            pass  # another job cached the same input first
+        except OSError as e:
+            logger.warning(f"Could not cache Ghostscript output for {source_path}: {e}")
+        return output_path
+
+    # Links share the inode: this keeps the job output (and the cache entry) clear of the age-based cleanup
+    os.utime(output_path)
+    logger.info(f"Reused cached Ghostscript output {cache_path} for {source_path}")
+    return output_path
+
+# Single PDFs at least this large are compressed as page-range shards by parallel gs processes
+PARALLEL_COMPRESS_MIN_BYTES = 20 * 1024 * 1024
+# Fewer pages than this per shard and the per-process startup cost outweighs the split
+_MIN_PAGES_PER_SHARD = 8
+
+def _compress_single_parallel(source_path, output_path, gs_options):
+    """
+    Compresses one PDF by running gs over disjoint page ranges concurrently and concatenating
+    the compressed shards. Falls back to a single gs run when the document is too short to split.
+    """
+    num_pages = len(PdfReader(source_path).pages)
+    n_shards = min(os.cpu_count() or 1, num_pages // _MIN_PAGES_PER_SHARD)
+    if n_shards < 2:
+        return _run_gs(source_path, output_path, gs_options)
+
+    # Contiguous 1-based (first, last) page ranges of near-equal length
+    pages_per_shard, remainder = divmod(num_pages, n_shards)
+    ranges = []
+    first = 1
+    for i in range(n_shards):
+        last = first + pages_per_shard - 1 + (1 if i < remainder else 0)
+        ranges.append((first, last))
+        first = last + 1
+
+    output_root = os.path.splitext(output_path)[0]
+    shard_paths = [f"{output_root}.shard{i}.pdf" for i in range(n_shards)]
+    try:
+        with ThreadPoolExecutor(max_workers=n_shards) as executor:
+            list(executor.map(
+                _run_gs, [source_path] * n_shards, shard_paths,
+                [gs_options + [f'-dFirstPage={first}', f'-dLastPage={last}'] for first, last in ranges]
+            ))
+
+        pdf_writer = PdfWriter()
+        try:
+            for shard_path in shard_paths:
+                pdf_writer.append(shard_path)
+            with open(output_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as output_file:
+                pdf_writer.write(output_file)
+        finally:
+            pdf_writer.close()
+    finally:
+        for shard_path in shard_paths:
+            try:
+                os.remove(shard_path)
+            except FileNotFoundError:
+                pass
+    return output_path
+
+def _pdf_to_jpegs(source_path, output_folder):
+    """
+    Rasterizes every page of a PDF to a JPEG in output_folder and returns the paths in page order.
+    Poppler renders the pages on one thread per core and encodes the JPEGs itself.
+    """
+    return convert_from_path(
+        source_path,
+        output_folder=output_folder,
+        fmt='jpeg',
+        paths_only=True,
+        thread_count=os.cpu_count() or 1,
+    )
+
+def _open_source_pdf(stack, source_path):
+    """
+    Opens a PDF for page extraction with pikepdf when it is installed, else with pypdf,
+    registering it on the ExitStack. Either object exposes a sliceable .pages.
+    """
+    if pikepdf is not None:
+        return stack.enter_context(pikepdf.Pdf.open(source_path))
+    return PdfReader(stack.enter_context(open(source_path, 'rb')))
+
+def _write_pdf_pages(source_pdf, start, end, stream):
+    """
+    Writes pages start..end (1-based, inclusive) of a PDF from _open_source_pdf to stream as a new document.
+    """
+    if pikepdf is not None:
+        with pikepdf.Pdf.new() as part_pdf:
+            part_pdf.pages.extend(source_pdf.pages[start - 1:end])
+            part_pdf.save(stream)
+        return
+
+    pdf_writer = PdfWriter()
+    # Add pages (user input is 1-based, PdfReader is 0-based); the slice resolves just these pages
+    for page in source_pdf.pages[start - 1:end]:
+        pdf_writer.add_page(page)
+    pdf_writer.write(stream)
+
+# One page ("7") or range ("3-5") of a comma-separated page_ranges string
+_PAGE_RANGE_RE = re.compile(r'\s*(\d+)\s*(?:-\s*(\d+)\s*)?')
+
+def _parse_page_ranges(page_ranges_str, num_pages):
+    """
+    Parses page_ranges like '1-5, 8, 10-12' into 1-based inclusive (start, end) tuples,
+    raising ValueError for malformed or out-of-bounds parts. Empty parts are skipped.
+    """
+    parsed_ranges = []
+    for part in page_ranges_str.split(','):
+        if not part.strip():
+            continue  # skip empty tokens like ",,"
+
+        match = _PAGE_RANGE_RE.fullmatch(part)
+        if match is None:
+            raise ValueError(f"Invalid range format: '{part.strip()}'")
+        start = int(match[1])
+        end = int(match[2]) if match[2] else start
+
+        if start > end:
+            raise ValueError(f"Start page {start} cannot be greater than end page {end}")
+        if start < 1 or end > num_pages:
+            if start == end:
+                raise ValueError(f"Page {start} is out of bounds. PDF has {num_pages} pages.")
+            raise ValueError(f"Page range {start}-{end} is out of bounds. PDF has {num_pages} pages.")
+        parsed_ranges.append((start, end))
+    return parsed_ranges
+
+# Columns written when a job finishes, successfully or not
+_TERMINAL_FIELDS = ['status', 'output_url', 'output_relative_path', 'error_message', 'updated_at']
+
 @shared_task(bind=True)
 def process_file_task(self, job_id):
     """
@@ -32,21 +245,25 @@ def process_file_task(self, job_id):
     """
     job = None
     try:
-        job = PdfToolJob.objects.get(id=job_id)
-        job.status = 'PROCESSING'
-        job.save()
+        # The uploads are fetched with the job (one query for the M2M set) and reused by every branch
+        job = PdfToolJob.objects.prefetch_related('uploaded_files').get(id=job_id)
+        uploaded_files = list(job.uploaded_files.all())
+        # Flag the job for the status endpoint with a plain UPDATE; the instance is written once, at the end
+        PdfToolJob.objects.filter(id=job_id).update(status='PROCESSING', updated_at=timezone.now())
+        invalidate_job_status(PdfToolJob.STATUS_CACHE_PREFIX, job_id)
 
         tool_type = job.tool_type
         logger.info(f"Task {self.request.id}: Starting processing for job ID: {job_id} with tool_type: {tool_type}")
 
         # Retrieve the list of file paths from the ManyToManyField
         file_path_relative_to_media_root = [
-            f.file.name for f in job.uploaded_files.all()
+            f.file.name for f in uploaded_files
         ]
 
         # Define the output directory once
-        output_dir_relative_to_media_root = os.path.join('pdf_tool_processed', str(job.id))
-        os.makedirs(os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root), exist_ok=True)
+        output_relative_prefix = f"pdf_tool_processed/{job.id}/"
+        output_dir_abs = os.path.join(settings.MEDIA_ROOT, 'pdf_tool_processed', str(job.id))
+        os.makedirs(output_dir_abs, exist_ok=True)
         
         # Determine if we need to handle a single file or multiple files
         is_single_file_job = tool_type in ['pdf_converter', 'pdf_splitter']
@@ -68,7 +285,7 @@ def process_file_task(self, job_id):
             base_filename = os.path.splitext(os.path.basename(absolute_source_file_path))[0]
             output_extension = target_format.lower()
             output_filename = f"converted_{base_filename}.{output_extension}"
-            output_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, output_filename)
+            output_full_absolute_path = os.path.join(output_dir_abs, output_filename)
 
             # Conversion Logic based on target_format
             if target_format.upper() == 'DOCX':
@@ -77,7 +294,9 @@ def process_file_task(self, job_id):
                 cv.close()
             
             elif target_format.upper() == 'XLSX':
-                tables = tabula.read_pdf(absolute_source_file_path, pages='all', multiple_tables=True, pandas_options={'header': None})
+                # pdfplumber extracts in-process; tabula started a JVM for every job
+                with pdfplumber.open(absolute_source_file_path) as pdf:
+                    tables = [pd.DataFrame(table) for page in pdf.pages for table in page.extract_tables()]
                 if tables:
                     with pd.ExcelWriter(output_full_absolute_path) as writer:
                         for i, df in enumerate(tables):
@@ -90,52 +309,44 @@ def process_file_task(self, job_id):
 
             elif target_format.upper() == 'PPTX':
                 prs = Presentation()
-                images = convert_from_path(absolute_source_file_path)
-                for img in images:
-                    blank_slide_layout = prs.slide_layouts[6]
-                    slide = prs.slides.add_slide(blank_slide_layout)
-                    
-                    temp_img_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, f"temp_{uuid.uuid4()}.jpg")
-                    img.save(temp_img_path, 'JPEG')
-                    
-                    slide.shapes.add_picture(temp_img_path, 0, 0, width=prs.slide_width, height=prs.slide_height)
-                    os.remove(temp_img_path)
+                blank_slide_layout = prs.slide_layouts[6]
+                with tempfile.TemporaryDirectory(dir=settings.FILE_UPLOAD_TEMP_DIR) as pages_dir:
+                    # Poppler's JPEGs are embedded as they are; PIL never decodes or re-encodes them
+                    for page_path in _pdf_to_jpegs(absolute_source_file_path, pages_dir):
+                        slide = prs.slides.add_slide(blank_slide_layout)
+                        slide.shapes.add_picture(page_path, 0, 0, width=prs.slide_width, height=prs.slide_height)
                 
                 prs.save(output_full_absolute_path)
 
             elif target_format.upper() == 'JPG':
-                images = convert_from_path(absolute_source_file_path)
-                image_output_folder = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, 'images')
-                os.makedirs(image_output_folder, exist_ok=True)
-                
-                for i, page in enumerate(images):
-                    image_filename = f"page_{i+1}.jpg"
-                    image_path = os.path.join(image_output_folder, image_filename)
-                    page.save(image_path, 'JPEG')
-
                 zip_filename = f"converted_{base_filename}.zip"
-                zip_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, zip_filename)
-                shutil.make_archive(
-                    os.path.splitext(zip_full_absolute_path)[0],
-                    'zip',
-                    image_output_folder
-                )
-                shutil.rmtree(image_output_folder)
-
-                download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, zip_filename).replace('\\', '/')
+                zip_full_absolute_path = os.path.join(output_dir_abs, zip_filename)
+                # Poppler's JPEGs go into the archive byte for byte; JPEG data doesn't deflate,
+                # so the entries are stored as-is
+                with tempfile.TemporaryDirectory(dir=settings.FILE_UPLOAD_TEMP_DIR) as pages_dir, \
+                        open(zip_full_absolute_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as zip_file, \
+                        zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_STORED) as zipf:
+                    for i, page_path in enumerate(_pdf_to_jpegs(absolute_source_file_path, pages_dir)):
+                        zipf.write(page_path, f"page_{i+1}.jpg")
+
+                output_relative_path = output_relative_prefix + zip_filename
+                download_url = settings.MEDIA_URL + output_relative_path
+                job.output_relative_path = output_relative_path
                 job.output_url = download_url
                 job.status = 'COMPLETED'
-                job.save()
+                job.save(update_fields=_TERMINAL_FIELDS)
                 return
 
             else:
                 raise ValueError(f"Unsupported target format: {target_format}")
 
             # Update Job with Output URL and Status (for single-file outputs)
-            download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, output_filename).replace('\\', '/')
+            output_relative_path = output_relative_prefix + output_filename
+            download_url = settings.MEDIA_URL + output_relative_path
+            job.output_relative_path = output_relative_path
             job.output_url = download_url
             job.status = 'COMPLETED'
-            job.save()
+            job.save(update_fields=_TERMINAL_FIELDS)
             return # IMPORTANT: Add return here to prevent fall-through
 
         elif tool_type == 'file_compressor':
@@ -154,8 +365,8 @@ def process_file_task(self, job_id):
             else: # low
                 gs_options = ['-dPDFSETTINGS=/printer']
 
-            compressed_file_paths = []
-            
+            output_full_absolute_paths = []
+            used_output_filenames = set()
             for absolute_source_file_path in source_files_abs_paths:
                 if not absolute_source_file_path.lower().endswith('.pdf'):
                     raise ValueError(f"File {absolute_source_file_path} is not a PDF.")
@@ -165,48 +376,56 @@ def process_file_task(self, job_id):
                 
                 base_filename = os.path.splitext(os.path.basename(absolute_source_file_path))[0]
                 output_filename = f"compressed_{base_filename}.pdf"
-                output_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, output_filename)
-                
-                gs_command = [
-                    'gs',
-                    '-sDEVICE=pdfwrite',
-                    '-dCompatibilityLevel=1.4',
-                    '-dNOPAUSE',
-                    '-dBATCH',
-                    '-dSAFER',
-                    '-sOutputFile=' + output_full_absolute_path,
-                    absolute_source_file_path
-                ]
-                gs_command[3:3] = gs_options
-
-                try:
-                    subprocess.run(gs_command, check=True, capture_output=True, text=True)
-                except subprocess.CalledProcessError as e:
-                    logger.error(f"Ghostscript command failed: {e.stderr}")
-                    raise RuntimeError(f"PDF compression failed: {e.stderr}")
+                # Uploads can share a name; each gs run (and zip entry) needs a file of its own
+                duplicate_number = 1
+                while output_filename in used_output_filenames:
+                    duplicate_number += 1
+                    output_filename = f"compressed_{base_filename}_{duplicate_number}.pdf"
+                used_output_filenames.add(output_filename)
+                output_full_absolute_paths.append(
+                    os.path.join(output_dir_abs, output_filename)
+                )
 
-                compressed_file_paths.append(output_full_absolute_path)
+            if len(source_files_abs_paths) == 1 and os.path.getsize(source_files_abs_paths[0]) >= PARALLEL_COMPRESS_MIN_BYTES:
+                # One big file: split it by pages so more than one core works on it
+                compressed_file_paths = [
+                    _compress_pdf_cached(source_files_abs_paths[0], output_full_absolute_paths[0], gs_options,
+                                         compress=_compress_single_parallel)
+                ]
+            else:
+                # Each gs is its own process, so threads are enough to run them side by side (a process
+                # pool can't be started from inside a daemonic prefork worker anyway)
+                with ThreadPoolExecutor(max_workers=min(len(source_files_abs_paths), os.cpu_count() or 1)) as executor:
+                    compressed_file_paths = list(executor.map(
+                        _compress_pdf_cached, source_files_abs_paths, output_full_absolute_paths,
+                        [gs_options] * len(source_files_abs_paths)
+                    ))
 
             if len(compressed_file_paths) > 1:
                 zip_filename = "compressed_files.zip"
-                zip_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, zip_filename)
+                zip_full_absolute_path = os.path.join(output_dir_abs, zip_filename)
                 
-                with zipfile.ZipFile(zip_full_absolute_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                # PDF streams are already Flate/JPEG encoded; deflating them again costs CPU for ~no gain
+                with open(zip_full_absolute_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as zip_file, \
+                        zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_STORED) as zipf:
                     for file_path in compressed_file_paths:
                         zipf.write(file_path, os.path.basename(file_path))
                 
                 for file_path in compressed_file_paths:
                     os.remove(file_path)
 
-                download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, zip_filename).replace('\\', '/')
+                output_relative_path = output_relative_prefix + zip_filename
+                download_url = settings.MEDIA_URL + output_relative_path
             else:
                 output_file_path = compressed_file_paths[0]
                 output_file_name = os.path.basename(output_file_path)
-                download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, output_file_name).replace('\\', '/')
+                output_relative_path = output_relative_prefix + output_file_name
+                download_url = settings.MEDIA_URL + output_relative_path
 
+            job.output_relative_path = output_relative_path
             job.output_url = download_url
             job.status = 'COMPLETED'
-            job.save()
+            job.save(update_fields=_TERMINAL_FIELDS)
             return
 
         # --- NEW: PDF Merging Logic ---
@@ -230,30 +449,50 @@ def process_file_task(self, job_id):
             # Map original filenames to absolute paths
             #file_path_map = {os.path.basename(path): path for path in source_files_abs_paths}
 
-            file_path_map = {f.original_filename: os.path.join(settings.MEDIA_ROOT, f.file.name) for f in job.uploaded_files.all()}
+            file_path_map = {f.original_filename: os.path.join(settings.MEDIA_ROOT, f.file.name) for f in uploaded_files}
 
-            pdf_merger = PdfWriter()
             output_filename = "merged_document.pdf"
-            output_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, output_filename)
+            output_full_absolute_path = os.path.join(output_dir_abs, output_filename)
+
+            if pikepdf is not None:
+                # qpdf copies the pages in C++; sources stay open until the merged file is saved.
+                # A file listed twice is opened twice, since qpdf won't copy the same foreign page twice
+                with pikepdf.Pdf.new() as merged_pdf, contextlib.ExitStack() as source_stack:
+                    for filename in merge_order:
+                        if filename in file_path_map:
+                            source_pdf = source_stack.enter_context(pikepdf.Pdf.open(file_path_map[filename]))
+                            merged_pdf.pages.extend(source_pdf.pages)
+                        else:
+                            logger.warning(f"File {filename} not found in the uploaded files. Skipping.")
 
-            try:
-                # Add PDFs in specified order
-                for filename in merge_order:
-                    if filename in file_path_map:
-                        pdf_merger.append(file_path_map[filename])
-                    else:
-                        logger.warning(f"File {filename} not found in the uploaded files. Skipping.")
-
-                # Write out merged PDF
-                with open(output_full_absolute_path, 'wb') as output_file:
-                    pdf_merger.write(output_file)
-            finally:
-                pdf_merger.close()
-
-            download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, output_filename).replace('\\', '/')
+                    merged_pdf.save(output_full_absolute_path)
+            else:
+                pdf_merger = PdfWriter()
+                try:
+                    # Add PDFs in specified order. Each file is parsed once, leniently, even if the order
+                    # lists it more than once; append(path) would build a fresh reader every time
+                    pdf_readers = {}
+                    for filename in merge_order:
+                        if filename in file_path_map:
+                            source_path = file_path_map[filename]
+                            if source_path not in pdf_readers:
+                                pdf_readers[source_path] = PdfReader(source_path, strict=False)
+                            pdf_merger.append(pdf_readers[source_path])
+                        else:
+                            logger.warning(f"File {filename} not found in the uploaded files. Skipping.")
+
+                    # Write out merged PDF
+                    with open(output_full_absolute_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as output_file:
+                        pdf_merger.write(output_file)
+                finally:
+                    pdf_merger.close()
+
+            output_relative_path = output_relative_prefix + output_filename
+            download_url = settings.MEDIA_URL + output_relative_path
+            job.output_relative_path = output_relative_path
             job.output_url = download_url
             job.status = 'COMPLETED'
-            job.save()
+            job.save(update_fields=_TERMINAL_FIELDS)
             return
 
             
@@ -262,104 +501,70 @@ def process_file_task(self, job_id):
             if not source_files_abs_paths or len(source_files_abs_paths) != 1:
                 job.status = 'FAILED'
                 job.error_message = "Splitting requires exactly one PDF file."
-                job.save()
+                job.save(update_fields=_TERMINAL_FIELDS)
                 return
 
             absolute_source_file_path = source_files_abs_paths[0]
             if not os.path.exists(absolute_source_file_path):
                 job.status = 'FAILED'
                 job.error_message = f"Source file does not exist at {absolute_source_file_path}"
-                job.save()
+                job.save(update_fields=_TERMINAL_FIELDS)
                 return
 
             page_ranges_str = job.page_ranges
             if not page_ranges_str:
                 job.status = 'FAILED'
                 job.error_message = "Page ranges are required for PDF splitting jobs."
-                job.save()
+                job.save(update_fields=_TERMINAL_FIELDS)
                 return
 
-            split_pdf_paths = []
             base_filename = os.path.splitext(os.path.basename(absolute_source_file_path))[0]
+            zip_filename = f"split_{base_filename}.zip"
+            zip_full_absolute_path = os.path.join(output_dir_abs, zip_filename)
 
             try:
-                with open(absolute_source_file_path, 'rb') as source_file:
-                    pdf_reader = PdfReader(source_file)
-                    num_pages = len(pdf_reader.pages)
+                with contextlib.ExitStack() as source_stack:
+                    source_pdf = _open_source_pdf(source_stack, absolute_source_file_path)
+                    num_pages = len(source_pdf.pages)
 
                     # --- Parse and validate page ranges ---
-                    parsed_ranges = []
                     try:
-                        for part in page_ranges_str.split(','):
-                            part = part.strip()
-                            if not part:
-                                continue  # skip empty tokens like ",,"
-
-                            if '-' in part and part.count('-') == 1:
-                                start_str, end_str = part.split('-')
-                                if not start_str.strip() or not end_str.strip():
-                                    raise ValueError(f"Invalid range format: '{part}'")
-
-                                start, end = int(start_str), int(end_str)
-                                if start > end:
-                                    raise ValueError(f"Start page {start} cannot be greater than end page {end}")
-                                if start < 1 or end > num_pages:
-                                    raise ValueError(f"Page range {start}-{end} is out of bounds. PDF has {num_pages} pages.")
-                                parsed_ranges.append((start, end))
-                            else:
-                                # Treat as a single page
-                                page_number = int(part)
-                                if page_number < 1 or page_number > num_pages:
-                                    raise ValueError(f"Page {page_number} is out of bounds. PDF has {num_pages} pages.")
-                                parsed_ranges.append((page_number, page_number))
-                    except (ValueError, IndexError) as e:
+                        parsed_ranges = _parse_page_ranges(page_ranges_str, num_pages)
+                    except ValueError as e:
                         job.status = 'FAILED'
                         job.error_message = f"Invalid page range format: {e}"
-                        job.save()
+                        job.save(update_fields=_TERMINAL_FIELDS)
                         return
 
-                    # --- Process each range ---
-                    for start, end in parsed_ranges:
-                        pdf_writer = PdfWriter()
-                        # Add pages (user input is 1-based, PdfReader is 0-based)
-                        for page_num in range(start - 1, end):
-                            pdf_writer.add_page(pdf_reader.pages[page_num])
-
-                        # Output filename
-                        if start == end:
-                            output_filename = f"{base_filename}_page_{start}.pdf"
-                        else:
-                            output_filename = f"{base_filename}_pages_{start}-{end}.pdf"
-
-                        output_full_absolute_path = os.path.join(
-                            settings.MEDIA_ROOT, output_dir_relative_to_media_root, output_filename
-                        )
-                        with open(output_full_absolute_path, 'wb') as output_file:
-                            pdf_writer.write(output_file)
+                    # --- Process each range, straight into the zip ---
+                    # Each part is serialized in memory and added as one entry; nothing is written
+                    # to disk but the archive. Split pages keep the source's already-compressed
+                    # streams, so they are stored as-is
+                    with open(zip_full_absolute_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as zip_file, \
+                            zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_STORED) as zipf:
+                        for start, end in parsed_ranges:
+                            # Output filename
+                            if start == end:
+                                output_filename = f"{base_filename}_page_{start}.pdf"
+                            else:
+                                output_filename = f"{base_filename}_pages_{start}-{end}.pdf"
 
-                        split_pdf_paths.append(output_full_absolute_path)
+                            part_buffer = io.BytesIO()
+                            _write_pdf_pages(source_pdf, start, end, part_buffer)
+                            zipf.writestr(output_filename, part_buffer.getvalue())
 
             except Exception as e:
                 job.status = 'FAILED'
                 job.error_message = f"Processing failed due to an internal error: {e}"
-                job.save()
+                job.save(update_fields=_TERMINAL_FIELDS)
                 return
 
-            # --- Zip all the split files together ---
-            zip_filename = f"split_{base_filename}.zip"
-            zip_full_absolute_path = os.path.join(settings.MEDIA_ROOT, output_dir_relative_to_media_root, zip_filename)
-            with zipfile.ZipFile(zip_full_absolute_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in split_pdf_paths:
-                    zipf.write(file_path, os.path.basename(file_path))
-
-            # Clean up individual split files
-            for file_path in split_pdf_paths:
-                os.remove(file_path)
-
-            download_url = os.path.join(settings.MEDIA_URL, output_dir_relative_to_media_root, zip_filename).replace('\\', '/')
+            output_relative_path = output_relative_prefix + zip_filename
+            download_url = settings.MEDIA_URL + output_relative_path
+            job.output_relative_path = output_relative_path
             job.output_url = download_url
             job.status = 'COMPLETED'
-            job.save()
+            job.save(update_fields=_TERMINAL_FIELDS)
             return
 
         
@@ -370,10 +575,10 @@ def process_file_task(self, job_id):
         if job:
             job.status = 'FAILED'
             job.error_message = f"Processing failed: Source file not found. Error: {e}"
-            job.save()
+            job.save(update_fields=_TERMINAL_FIELDS)
     except Exception as e:
         logger.error(f"Task {self.request.id}: An unexpected error occurred for job {job_id}: {e}", exc_info=True)
         if job:
             job.status = 'FAILED'
             job.error_message = f"Processing failed due to an internal error: {str(e)}"
-            job.save()
\ No newline at end of file
+            job.save(update_fields=_TERMINAL_FIELDS)
\ No newline at end of file
@@ -5,14 +5,20 @@ from rest_framework import status, generics
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
 from django.conf import settings
-from django.http import FileResponse, Http404
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse
 import os
+import mimetypes
 import uuid
 import json
-from .tasks import process_file_task
+from urllib.parse import quote
 from .models import PdfToolJob, PdfUploadedFile
 from .serializers import PdfToolJobSerializer
 from .permissions import HasConversionAllowance
+from opustools_project.utils import job_status_cache_key, job_status_cache_timeout
+
+# Bytes read per chunk when streaming a download (FileResponse defaults to 4 KiB)
+DOWNLOAD_BLOCK_SIZE = 4 * 1024 * 1024
 
 class PdfToolJobView(APIView):
     parser_classes = (MultiPartParser, FormParser)
@@ -50,53 +56,66 @@ class PdfToolJobView(APIView):
         
         if serializer.is_valid():
             job = serializer.save(user=request.user if request.user.is_authenticated else None)
-            process_file_task.delay(job_id=job.id)
+            # Imported here so web workers don't load the PDF/Office libraries until a job is queued
+            from .tasks import process_file_task
+            process_file_task.delay(job_id=str(job.id))
 
             return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class PdfToolJobStatusView(generics.RetrieveAPIView):
-    queryset = PdfToolJob.objects.all()
+    # The serializer nests uploaded_files; fetch them with the job instead of lazily
+    queryset = PdfToolJob.objects.prefetch_related('uploaded_files')
     serializer_class = PdfToolJobSerializer
     lookup_field = 'id'
     permission_classes = [AllowAny]
 
     def get(self, request, *args, **kwargs):
-        try:
-            instance = self.get_object()
-            serializer = self.get_serializer(instance)
-            return Response(serializer.data)
-        except Http404:
-            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        # Pollers hit this every few seconds; serve the serialized job from cache when possible
+        cache_key = job_status_cache_key(PdfToolJob.STATUS_CACHE_PREFIX, kwargs[self.lookup_field])
+        data = cache.get(cache_key)
+        if data is None:
+            try:
+                instance = self.get_object()
+            except Http404:
+                return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+            data = dict(self.get_serializer(instance).data)
+            cache.set(cache_key, data, job_status_cache_timeout(data['status']))
+        return Response(data)
 
 class PdfToolJobDownloadView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, job_id, *args, **kwargs):
         try:
-            job = PdfToolJob.objects.get(id=job_id)
+            job = PdfToolJob.objects.only('status', 'output_url', 'output_relative_path').get(id=job_id)
         except PdfToolJob.DoesNotExist:
             raise Http404("Job not found.")
 
         if job.status != 'COMPLETED' or not job.output_url:
             return Response({"error": "File not ready for download or job failed."}, status=status.HTTP_404_NOT_FOUND)
 
-        output_url = job.output_url
-        if not output_url.startswith(settings.MEDIA_URL):
-            return Response({"error": "Invalid output URL format."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        relative_path_in_media = output_url[len(settings.MEDIA_URL):]
+        relative_path_in_media = job.get_output_relative_path()
         output_file_path = os.path.join(settings.MEDIA_ROOT, relative_path_in_media)
-
-        if not os.path.exists(output_file_path):
-            return Response({"error": "Processed file not found on server."}, status=status.HTTP_404_NOT_FOUND)
-        
         file_name = os.path.basename(output_file_path)
+        content_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
 
-        try:
-            response = FileResponse(open(output_file_path, 'rb'), content_type='application/octet-stream')
+        # Let nginx send the file with sendfile(2); the worker only returns headers
+        if settings.USE_X_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.X_ACCEL_REDIRECT_PREFIX + quote(relative_path_in_media)
             response['Content-Disposition'] = f'attachment; filename="{file_name}"'
             return response
+
+        try:
+            # Opening is the existence check. FileResponse sets Content-Length and an RFC 6266
+            # Content-Disposition, and the WSGI server can hand the file to sendfile(2)
+            response = FileResponse(open(output_file_path, 'rb'), as_attachment=True, filename=file_name,
+                                    content_type=content_type)
+            response.block_size = DOWNLOAD_BLOCK_SIZE
+            return response
+        except FileNotFoundError:
+            return Response({"error": "Processed file not found on server."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            return Response({"error": f"Could not prepare file for download: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": f"Could not prepare file for download: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)